@@ -0,0 +1,124 @@
+# Lay out many rooms in one run from a CSV or JSON lines file of room requests
+# Usage:
+#   python batch_layout.py rooms.csv --output results.jsonl --processes 8
+#   python batch_layout.py rooms.jsonl --cache-directory layout_cache
+# Every JSON line is a room request as taken by main.run_layout_request
+# CSV files have a header with the columns id, width, length, height, panelboard_count, transformer_count,
+# door_x, door_y, shuffle, seed, trial_count and interior_rows, only width and length are required
+# Results are written as JSON lines as soon as each room finishes, with the index of the room in the input file
+# A row or line that cannot be read gets an error result like a room that fails, the rest of the batch still runs
+
+# Import necessary libraries
+import argparse
+import concurrent.futures
+import csv
+import json
+import os
+import sys
+
+import layout_service
+
+def get_request_from_csv_row(row: dict) -> dict:
+    # Convert a CSV row to a room request, empty cells use the defaults of run_layout_request
+    request = {'width': float(row['width']), 'length': float(row['length'])}
+    if row.get('id'):
+        request['id'] = row['id']
+    if row.get('height'):
+        request['height'] = float(row['height'])
+    for column in ('panelboard_count', 'transformer_count', 'seed', 'trial_count'):
+        if row.get(column):
+            request[column] = int(row[column])
+    for column in ('shuffle', 'interior_rows'):
+        if row.get(column):
+            request[column] = row[column].strip().lower() in ('1', 'true', 'yes')
+    if row.get('door_x') and row.get('door_y'):
+        request['doors'] = [{'x': float(row['door_x']), 'y': float(row['door_y'])}]
+    return request
+
+def get_invalid_request(line_number, error, room_id=None) -> dict: # Get the request yielded for a row or line that cannot be read
+    invalid_request = {'error': f'Line {line_number}: {error.__class__.__name__}: {error}'}
+    if room_id:
+        invalid_request['id'] = room_id
+    return invalid_request
+
+def read_room_requests(path):
+    # Yield the room requests of a CSV or JSON lines file one by one, the file is never read into memory at once
+    # A row or line that cannot be read is yielded as a request with only an error, see get_invalid_request
+    with open(path, newline='') as rooms_file:
+        if path.lower().endswith('.csv'):
+            reader = csv.DictReader(rooms_file)
+            for row in reader:
+                try:
+                    yield get_request_from_csv_row(row)
+                except (KeyError, TypeError, ValueError) as error:
+                    yield get_invalid_request(reader.line_num, error, row.get('id'))
+        else:
+            for line_number, line in enumerate(rooms_file, 1):
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as error:
+                        yield get_invalid_request(line_number, error)
+
+def is_invalid_request(room_request) -> bool: # Check if a request is a row or line that could not be read
+    return isinstance(room_request, dict) and 'error' in room_request and set(room_request) <= {'error', 'id'}
+
+def layout_rooms(room_requests, processes=None, max_pending=None, cache_directory=None):
+    # Yield (index, result) for every room request as soon as its layout finishes
+    # room_requests can be any iterable, at most max_pending rooms are read ahead so memory stays flat for any batch size
+    # The worker processes keep their footprint templates, so the equipment templates are shared by all rooms of a worker
+    # Invalid requests from read_room_requests are yielded as their own results without being laid out
+    if processes == 1:
+        layout_service.initialize_worker(cache_directory)
+        for index, room_request in enumerate(room_requests):
+            if is_invalid_request(room_request):
+                yield index, room_request
+            else:
+                yield index, layout_service.run_room_request(room_request)
+        return
+
+    if max_pending is None:
+        max_pending = (processes or os.cpu_count() or 1) * 4
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=layout_service.initialize_worker,
+                                                initargs=(cache_directory,)) as executor:
+        pending = {}
+        for index, room_request in enumerate(room_requests):
+            if is_invalid_request(room_request):
+                yield index, room_request
+                continue
+            pending[executor.submit(layout_service.run_room_request, room_request)] = index
+            if len(pending) >= max_pending:
+                done, not_done = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        for future in concurrent.futures.as_completed(pending):
+            yield pending[future], future.result()
+
+def main_batch():
+    parser = argparse.ArgumentParser(description='Lay out many electrical rooms from a CSV or JSON lines file')
+    parser.add_argument('rooms', help='CSV or JSON lines file of room requests')
+    parser.add_argument('--output', help='JSON lines file for the results, printed when not given')
+    parser.add_argument('--processes', type=int, help='Number of worker processes, defaults to the number of CPUs')
+    parser.add_argument('--max-pending', type=int, help='Rooms read ahead of the finished layouts, defaults to 4 per process')
+    parser.add_argument('--cache-directory', help='Directory of the layout cache, no cache without it')
+    arguments = parser.parse_args()
+
+    output_file = open(arguments.output, 'w') if arguments.output else sys.stdout
+    room_count = 0
+    failed_count = 0
+    try:
+        results = layout_rooms(read_room_requests(arguments.rooms), arguments.processes, arguments.max_pending,
+                               arguments.cache_directory)
+        for index, result in results:
+            output_file.write(json.dumps(dict(result, index=index)) + '\n')
+            output_file.flush()
+            room_count += 1
+            if 'error' in result or not result['success']:
+                failed_count += 1
+    finally:
+        if arguments.output:
+            output_file.close()
+    print(f'{room_count} rooms laid out, {failed_count} failed or incomplete', file=sys.stderr)
+
+if __name__ == '__main__':
+    main_batch()
@@ -0,0 +1,200 @@
+# Benchmark the layout engine headless across room sizes, equipment counts, door positions and seeds
+# Usage:
+#   python benchmark.py --output benchmark_results.jsonl
+#   python benchmark.py --quick --output quick_results.jsonl --compare benchmark_results.jsonl
+#   python benchmark.py --quick --check-exact
+# Every run writes one JSON line per configuration so results can be compared between commits
+
+# Import necessary libraries
+import argparse
+import itertools
+import json
+import os
+import time
+
+import main
+
+# Default sweep of room sizes (width, length), equipment counts (panelboards, transformers), door walls and seeds
+ROOM_SIZES = [(8, 6), (12, 10), (20, 14), (30, 20), (40, 30)]
+EQUIPMENT_COUNTS = [(4, 1), (12, 3), (30, 6), (60, 10)]
+DOOR_WALLS = ['south', 'east']
+SEEDS = [0, 1, 2]
+
+# Smaller sweep for a quick check
+QUICK_ROOM_SIZES = [(12, 10), (30, 20)]
+QUICK_EQUIPMENT_COUNTS = [(12, 3), (30, 6)]
+QUICK_DOOR_WALLS = ['south']
+QUICK_SEEDS = [0]
+
+def get_door_point(room_width, room_length, door_wall) -> main.Point:
+    # Get the point in the middle of a wall, the room snaps it to the nearest door position
+    if door_wall == 'south':
+        return main.Point(0, -room_length / 2)
+    if door_wall == 'north':
+        return main.Point(0, room_length / 2)
+    if door_wall == 'east':
+        return main.Point(room_width / 2, 0)
+    return main.Point(-room_width / 2, 0)
+
+def create_room(room_width, room_length, panelboard_count, transformer_count, door_wall) -> main.ElectricalRoom:
+    # Create the room the same way the Grasshopper script does
+    electrical_room = main.ElectricalRoom(room_width, room_length)
+    example_panelboard = main.Panelboard(name='PBX')
+    for i in range(panelboard_count):
+        electrical_room.add_equipment(main.Panelboard(name=f'PB{i+1}', geometry_copy_equipment=example_panelboard))
+    example_transformer = main.Transformer(name='TX')
+    for i in range(transformer_count):
+        electrical_room.add_equipment(main.Transformer(name=f'T{i+1}', geometry_copy_equipment=example_transformer))
+    electrical_room.add_door_from_point(get_door_point(room_width, room_length, door_wall))
+    return electrical_room
+
+def run_benchmark(room_width, room_length, panelboard_count, transformer_count, door_wall, seed) -> dict:
+    electrical_room = create_room(room_width, room_length, panelboard_count, transformer_count, door_wall)
+
+    start_time = time.perf_counter()
+    layout_success = electrical_room.layout_equipment(shuffle=True, seed=seed)
+    layout_seconds = time.perf_counter() - start_time
+
+    # Run the layout again on a fresh room with instrumentation, so the timing above is not affected by it
+    instrumented_room = create_room(room_width, room_length, panelboard_count, transformer_count, door_wall)
+    instrumented_room.instrumentation.enabled = True
+    instrumented_room.layout_equipment(shuffle=True, seed=seed)
+    summary = instrumented_room.instrumentation.get_summary()
+
+    start_time = time.perf_counter()
+    total_wall_distance, total_blocked_wall_distance = electrical_room.calculate_blocked_walls_distance()
+    blocked_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    electrical_room.calculate_blocked_walls_distance(method='sampled')
+    sampled_blocked_seconds = time.perf_counter() - start_time
+
+    return {
+        'room_width': room_width,
+        'room_length': room_length,
+        'panelboard_count': panelboard_count,
+        'transformer_count': transformer_count,
+        'door_wall': door_wall,
+        'seed': seed,
+        'success': layout_success,
+        'placed_count': len(electrical_room.placed_equipment),
+        'place_equipment_calls': summary.candidates_tried,
+        'candidates_pruned': summary.candidates_pruned,
+        'rejections': summary.rejections,
+        'check_seconds': summary.check_seconds,
+        'layout_seconds': layout_seconds,
+        'blocked_seconds': blocked_seconds,
+        'sampled_blocked_seconds': sampled_blocked_seconds,
+        'total_wall_distance': total_wall_distance,
+        'total_blocked_wall_distance': total_blocked_wall_distance,
+    }
+
+def check_exact_layout(room_width, room_length, panelboard_count, transformer_count, door_wall, seed, time_limit=2.0) -> str:
+    # The exact layout must not depend on a layout already in the room, the Grasshopper script runs it after the greedy layout fails
+    # Returns a message if the result after the greedy layout differs from the result on a fresh room, otherwise None
+    fresh_room = create_room(room_width, room_length, panelboard_count, transformer_count, door_wall)
+    fresh_result = fresh_room.layout_equipment_exact(time_limit)
+
+    greedy_room = create_room(room_width, room_length, panelboard_count, transformer_count, door_wall)
+    greedy_room.layout_equipment(shuffle=True, seed=seed)
+    greedy_result = greedy_room.layout_equipment_exact(time_limit)
+
+    # Timeouts depend on the machine, only decided results are compared
+    if 'timeout' in (fresh_result['status'], greedy_result['status']):
+        return None
+    if fresh_result['status'] != greedy_result['status'] or fresh_result.get('option_count') != greedy_result.get('option_count'):
+        key = (room_width, room_length, panelboard_count, transformer_count, door_wall, seed)
+        return (f'{key}: exact layout {greedy_result["status"]} with {greedy_result.get("option_count")} options after the greedy layout, '
+                f'{fresh_result["status"]} with {fresh_result.get("option_count")} options on a fresh room')
+    return None
+
+def get_benchmark_key(result: dict) -> tuple:
+    return (result['room_width'], result['room_length'], result['panelboard_count'],
+            result['transformer_count'], result['door_wall'], result['seed'])
+
+def read_baseline(baseline_path) -> dict:
+    # Read the results of a previous run, keyed by configuration
+    baseline = {}
+    with open(baseline_path) as baseline_file:
+        for line in baseline_file:
+            if line.strip():
+                result = json.loads(line)
+                baseline[get_benchmark_key(result)] = result
+    return baseline
+
+def compare_results(results: list, baseline: dict, slowdown=1.5) -> list:
+    # Compare results with a previous run, returns a message for every slower or changed configuration
+    messages = []
+    for result in results:
+        previous = baseline.get(get_benchmark_key(result))
+        if previous is None:
+            continue
+        if result['placed_count'] != previous['placed_count']:
+            messages.append(f'{get_benchmark_key(result)}: placed {result["placed_count"]}, previously {previous["placed_count"]}')
+        for key in ('layout_seconds', 'blocked_seconds'):
+            # Very short timings are too noisy to compare
+            if previous[key] > 0.01 and result[key] > previous[key] * slowdown:
+                messages.append(f'{get_benchmark_key(result)}: {key} {result[key]:.4f}, previously {previous[key]:.4f}')
+    return messages
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description='Benchmark the electrical room layout headless')
+    parser.add_argument('--output', default='benchmark_results.jsonl', help='JSON lines file for the results')
+    parser.add_argument('--quick', action='store_true', help='Run a smaller sweep')
+    parser.add_argument('--compare', help='JSON lines file of a previous run to compare with')
+    parser.add_argument('--slowdown', type=float, default=1.5, help='Report timings slower than this factor')
+    parser.add_argument('--check-exact', action='store_true', help='Check the exact layout is the same on a fresh room and after the greedy layout')
+    arguments = parser.parse_args()
+
+    # The baseline is read before the output is written, so the run is never compared with itself
+    baseline = None
+    if arguments.compare:
+        if os.path.abspath(arguments.output) == os.path.abspath(arguments.compare):
+            parser.error('--output and --compare must be different files')
+        baseline = read_baseline(arguments.compare)
+
+    # The benchmark always runs on the headless box backend
+    main.set_geometry_backend(main.BoxBackend())
+
+    if arguments.quick:
+        sweep = itertools.product(QUICK_ROOM_SIZES, QUICK_EQUIPMENT_COUNTS, QUICK_DOOR_WALLS, QUICK_SEEDS)
+    else:
+        sweep = itertools.product(ROOM_SIZES, EQUIPMENT_COUNTS, DOOR_WALLS, SEEDS)
+    sweep = list(sweep)
+
+    results = []
+    with open(arguments.output, 'w') as output_file:
+        for (room_width, room_length), (panelboard_count, transformer_count), door_wall, seed in sweep:
+            result = run_benchmark(room_width, room_length, panelboard_count, transformer_count, door_wall, seed)
+            results.append(result)
+            output_file.write(json.dumps(result) + '\n')
+            print(f'{room_width}x{room_length} PB{panelboard_count} T{transformer_count} {door_wall} seed {seed}: '
+                  f'placed {result["placed_count"]}/{panelboard_count + transformer_count}, '
+                  f'{result["place_equipment_calls"]} place_equipment calls, '
+                  f'layout {result["layout_seconds"]:.4f}s, blocked walls {result["blocked_seconds"]:.4f}s')
+
+    total_layout_seconds = sum(result['layout_seconds'] for result in results)
+    print(f'{len(results)} layouts in {total_layout_seconds:.3f}s, results written to {arguments.output}')
+
+    if baseline is not None:
+        messages = compare_results(results, baseline, arguments.slowdown)
+        for message in messages:
+            print(message)
+        if messages:
+            raise SystemExit(1)
+        print('No regressions found')
+
+    if arguments.check_exact:
+        messages = []
+        for (room_width, room_length), (panelboard_count, transformer_count), door_wall, seed in sweep:
+            message = check_exact_layout(room_width, room_length, panelboard_count, transformer_count, door_wall, seed)
+            if message is not None:
+                messages.append(message)
+        for message in messages:
+            print(message)
+        if messages:
+            raise SystemExit(1)
+        print('Exact layouts match on fresh rooms')
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -0,0 +1,154 @@
+# Serve the layout engine over HTTP with a pool of warm worker processes
+# Usage:
+#   python layout_service.py serve --port 8765 --processes 4 --cache-directory layout_cache
+#   python layout_service.py request rooms.json --url http://127.0.0.1:8765
+#   python layout_service.py request rooms.json --local
+# POST /layout takes {"rooms": [room request, ...]} and returns {"results": [layout result, ...]} in the same order
+# A room request is the dictionary taken by main.run_layout_request, for example
+#   {"id": "A", "width": 12, "length": 10, "panelboard_count": 6, "transformer_count": 2, "doors": [{"x": 0, "y": -5}], "seed": 0}
+# GET /health returns {"status": "ok"}
+
+# Import necessary libraries
+import argparse
+import concurrent.futures
+import http.server
+import json
+import urllib.request
+
+import main
+
+# Layout cache of the worker process, set by initialize_worker
+worker_layout_cache = None
+
+def initialize_worker(cache_directory=None):
+    # Runs once in every worker process, the footprint templates built here are reused by every request of the worker
+    global worker_layout_cache
+    main.set_geometry_backend(main.BoxBackend())
+    worker_layout_cache = main.LayoutCache(cache_directory) if cache_directory else None
+    for equipment in (main.Panelboard(name='PBX'), main.Transformer(name='TX')):
+        for vector in (main.Vector(0, 1), main.Vector(0, -1), main.Vector(1, 0), main.Vector(-1, 0)):
+            equipment.get_footprint_template(vector)
+
+def run_room_request(request: dict) -> dict:
+    # Lay out one room in a worker process, an invalid room returns an error instead of failing the whole batch
+    try:
+        return main.run_layout_request(request, worker_layout_cache)
+    except Exception as error:
+        result = {'error': f'{error.__class__.__name__}: {error}'}
+        if isinstance(request, dict) and 'id' in request:
+            result['id'] = request['id']
+        return result
+
+def get_room_requests(payload) -> list: # Get the list of room requests from a request body
+    if not isinstance(payload, dict) or not isinstance(payload.get('rooms'), list):
+        raise ValueError('The request body must be a JSON object with a list of rooms')
+    return payload['rooms']
+
+# Define the LayoutService class
+# Holds the worker pool, the HTTP handler and the local client use the same service
+class LayoutService:
+    def __init__(self, processes=None, cache_directory=None):
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=initialize_worker,
+                                                               initargs=(cache_directory,))
+
+    def layout_rooms(self, room_requests: list) -> list:
+        # The rooms of a batch are spread over the workers, the results keep the order of the requests
+        return list(self.executor.map(run_room_request, room_requests))
+
+    def close(self):
+        self.executor.shutdown()
+
+# Define the LayoutRequestHandler class
+class LayoutRequestHandler(http.server.BaseHTTPRequestHandler):
+    service = None # The LayoutService, set by create_server
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok'})
+        else:
+            self.send_json(404, {'error': f'Unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/layout':
+            self.send_json(404, {'error': f'Unknown path {self.path}'})
+            return
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+            room_requests = get_room_requests(json.loads(self.rfile.read(content_length)))
+        except ValueError as error:
+            self.send_json(400, {'error': str(error)})
+            return
+        self.send_json(200, {'results': self.service.layout_rooms(room_requests)})
+
+def create_server(host='127.0.0.1', port=8765, processes=None, cache_directory=None) -> http.server.ThreadingHTTPServer:
+    # Each HTTP request is handled in its own thread, the layouts of all requests share the worker pool
+    handler = type('LayoutRequestHandler', (LayoutRequestHandler,), {'service': LayoutService(processes, cache_directory)})
+    return http.server.ThreadingHTTPServer((host, port), handler)
+
+# Define the LayoutServiceClient class
+class LayoutServiceClient:
+    def __init__(self, url='http://127.0.0.1:8765', timeout=600):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def layout_rooms(self, room_requests: list) -> list:
+        body = json.dumps({'rooms': room_requests}).encode('utf-8')
+        request = urllib.request.Request(f'{self.url}/layout', data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())['results']
+
+# Define the LocalLayoutServiceClient class
+# Stand-in for LayoutServiceClient that runs the requests in this process, for testing without a server
+class LocalLayoutServiceClient:
+    def __init__(self, cache_directory=None):
+        initialize_worker(cache_directory)
+
+    def layout_rooms(self, room_requests: list) -> list:
+        # The requests go through JSON like they would over HTTP
+        room_requests = json.loads(json.dumps(room_requests))
+        return json.loads(json.dumps([run_room_request(room_request) for room_request in room_requests]))
+
+def main_service():
+    parser = argparse.ArgumentParser(description='Serve electrical room layouts over HTTP')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='Run the layout service')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--processes', type=int, help='Number of worker processes, defaults to the number of CPUs')
+    serve_parser.add_argument('--cache-directory', help='Directory of the layout cache, no cache without it')
+
+    request_parser = subparsers.add_parser('request', help='Send a JSON file of room requests and print the results')
+    request_parser.add_argument('rooms', help='JSON file with a list of room requests or {"rooms": [...]}')
+    request_parser.add_argument('--url', default='http://127.0.0.1:8765')
+    request_parser.add_argument('--local', action='store_true', help='Run the requests in this process instead of the service')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'serve':
+        server = create_server(arguments.host, arguments.port, arguments.processes, arguments.cache_directory)
+        print(f'Layout service listening on http://{arguments.host}:{arguments.port}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            server.RequestHandlerClass.service.close()
+        return
+
+    with open(arguments.rooms) as rooms_file:
+        payload = json.load(rooms_file)
+    room_requests = payload if isinstance(payload, list) else get_room_requests(payload)
+    client = LocalLayoutServiceClient() if arguments.local else LayoutServiceClient(arguments.url)
+    print(json.dumps(client.layout_rooms(room_requests), indent=2))
+
+if __name__ == '__main__':
+    main_service()
@@ -1,13 +1,30 @@
 # Import necessary libraries
-import Rhino
+import array
+import bisect
+import collections
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import logging
 import math
+import os
 import random
+import time
 
-# Import grasshopper treehelper
-import ghpythonlib.treehelpers as th
+# Rhino is only available inside Rhino and Grasshopper, without it the layout runs headless with the box backend
+try:
+    import Rhino
+except ImportError:
+    Rhino = None
+
+# The layout logs its progress at debug level instead of printing, enable it with logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger('electrical_room_layout')
 
 # Define the Point class
 class Point:
+    __slots__ = ('x', 'y') # Rooms create many points, slots keep them small
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -19,6 +36,8 @@ class Point:
         return Rhino.Geometry.Point3d(self.x, self.y, 0)
     
 class Vector:
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -50,6 +69,564 @@ class Vector:
 def inches_to_feet(inches):
     return inches / 12
 
+# Define the Box class
+# An axis-aligned box used for fast collision checks, every piece of geometry in the layout is built from these
+class Box:
+    def __init__(self, min_x, min_y, min_z, max_x, max_y, max_z):
+        self.min_x = min_x
+        self.min_y = min_y
+        self.min_z = min_z
+        self.max_x = max_x
+        self.max_y = max_y
+        self.max_z = max_z
+
+    def intersects(self, other: 'Box', tolerance=0.001) -> bool: # Check if two boxes overlap with a positive volume
+        # Boxes that only touch (share a face, edge or corner) do not intersect, matching the Brep boolean intersection
+        return (min(self.max_x, other.max_x) - max(self.min_x, other.min_x) > tolerance and
+                min(self.max_y, other.max_y) - max(self.min_y, other.min_y) > tolerance and
+                min(self.max_z, other.max_z) - max(self.min_z, other.min_z) > tolerance)
+
+    def subtract(self, other: 'Box', tolerance=0.001) -> list: # Subtract a box from this box, returns a list of boxes
+        if not self.intersects(other, tolerance):
+            return [self]
+
+        # Split the box into up to six pieces around the overlapping region
+        pieces = []
+        min_x, max_x = max(self.min_x, other.min_x), min(self.max_x, other.max_x)
+        min_y, max_y = max(self.min_y, other.min_y), min(self.max_y, other.max_y)
+        if other.min_x > self.min_x: # Piece on the negative x side
+            pieces.append(Box(self.min_x, self.min_y, self.min_z, other.min_x, self.max_y, self.max_z))
+        if other.max_x < self.max_x: # Piece on the positive x side
+            pieces.append(Box(other.max_x, self.min_y, self.min_z, self.max_x, self.max_y, self.max_z))
+        if other.min_y > self.min_y: # Piece on the negative y side
+            pieces.append(Box(min_x, self.min_y, self.min_z, max_x, other.min_y, self.max_z))
+        if other.max_y < self.max_y: # Piece on the positive y side
+            pieces.append(Box(min_x, other.max_y, self.min_z, max_x, self.max_y, self.max_z))
+        if other.min_z > self.min_z: # Piece below
+            pieces.append(Box(min_x, min_y, self.min_z, max_x, max_y, other.min_z))
+        if other.max_z < self.max_z: # Piece above
+            pieces.append(Box(min_x, min_y, other.max_z, max_x, max_y, self.max_z))
+        return pieces
+
+    def translate(self, x, y) -> 'Box': # Get a copy of the box moved by x and y
+        return Box(self.min_x + x, self.min_y + y, self.min_z, self.max_x + x, self.max_y + y, self.max_z)
+
+    def rotate(self, center: 'Point', orientation: 'Vector') -> 'Box': # Rotate the box around the Z-axis so the Y-axis points along the orientation
+        # The orientation is always a multiple of 90 degrees so the rotated box is still axis-aligned
+        # Local x maps to (orientation.y, -orientation.x) and local y maps to (orientation.x, orientation.y)
+        xs = []
+        ys = []
+        for x in (self.min_x - center.x, self.max_x - center.x):
+            for y in (self.min_y - center.y, self.max_y - center.y):
+                xs.append(center.x + x * orientation.y + y * orientation.x)
+                ys.append(center.y - x * orientation.x + y * orientation.y)
+        return Box(min(xs), min(ys), self.min_z, max(xs), max(ys), self.max_z)
+
+# Define the SpatialGrid class
+# A uniform grid over the floor plan, each cell keeps the boxes whose footprint overlaps it
+class SpatialGrid:
+    def __init__(self, cell_size=2.0):
+        self.cell_size = cell_size # Size of each grid cell in feet
+        self.cells = {} # Dictionary of (column, row) to a list of (box, item) entries
+
+    def get_cells(self, box: Box) -> list: # Get the cells overlapped by the footprint of a box
+        min_column = math.floor(box.min_x / self.cell_size)
+        max_column = math.floor(box.max_x / self.cell_size)
+        min_row = math.floor(box.min_y / self.cell_size)
+        max_row = math.floor(box.max_y / self.cell_size)
+        return [(column, row) for column in range(min_column, max_column + 1) for row in range(min_row, max_row + 1)]
+
+    def insert(self, box: Box, item=None): # Add a box to the grid, item is the object the box belongs to
+        entry = (box, item)
+        for cell in self.get_cells(box):
+            if cell in self.cells:
+                self.cells[cell].append(entry)
+            else:
+                self.cells[cell] = [entry]
+
+    def remove(self, boxes: list, item): # Remove the boxes of an item that were added with insert
+        for box in boxes:
+            for cell in self.get_cells(box):
+                entries = [entry for entry in self.cells.get(cell, ()) if entry[1] is not item]
+                if entries:
+                    self.cells[cell] = entries
+                else:
+                    self.cells.pop(cell, None)
+
+    def query(self, box: Box) -> list: # Get the boxes that could overlap a box, each box is only returned once
+        boxes = []
+        seen = set()
+        for cell in self.get_cells(box):
+            for entry in self.cells.get(cell, ()):
+                if id(entry) not in seen:
+                    seen.add(id(entry))
+                    boxes.append(entry[0])
+        return boxes
+
+    def query_items(self, box: Box) -> list: # Get the items of the boxes that could overlap a box, each item is only returned once
+        items = []
+        seen = set()
+        for cell in self.get_cells(box):
+            for entry in self.cells.get(cell, ()):
+                if id(entry[1]) not in seen:
+                    seen.add(id(entry[1]))
+                    items.append(entry[1])
+        return items
+
+    def intersects(self, boxes: list) -> bool: # Check if any of the boxes overlaps a box in the grid
+        for box in boxes:
+            for other_box in self.query(box):
+                if box.intersects(other_box):
+                    return True
+        return False
+
+    def find_intersection(self, boxes: list): # Get the first (box, item) entry overlapping any of the boxes, None if there is none
+        for box in boxes:
+            seen = set()
+            for cell in self.get_cells(box):
+                for entry in self.cells.get(cell, ()):
+                    if id(entry) not in seen:
+                        seen.add(id(entry))
+                        if box.intersects(entry[0]):
+                            return entry
+        return None
+
+# Define the CandidateSet class
+# The candidate points around the room stored as a structure of arrays instead of a Point and a Vector per point
+# The points of each wall are contiguous and in the order of generate_points_and_vectors
+# Interior rows are added with add_points, their points face the vectors of the walls but are not part of wall_ranges
+# Removing a point only clears it in the active mask, Points are only created when a candidate is read
+class CandidateSet:
+    wall_vectors = (Vector(0, 1), Vector(0, -1), Vector(-1, 0), Vector(1, 0)) # Bottom, top, right and left walls, shared by all candidates
+
+    def __init__(self):
+        self.x = array.array('d')
+        self.y = array.array('d')
+        self.normal_x = array.array('b')
+        self.normal_y = array.array('b')
+        self.wall_ids = array.array('b') # Index of the wall in wall_vectors
+        self.wall_ranges = [(0, 0)] * len(self.wall_vectors) # (start, end) indexes of the points of each wall
+        self.active = bytearray() # 1 for the points that are not removed
+        self.active_count = 0
+
+    def add_points(self, x_values, y_values, wall_ids) -> tuple: # Add points facing the vectors of wall_ids, returns their (start, end) indexes
+        start = len(self.x)
+        self.x.extend(x_values)
+        self.y.extend(y_values)
+        self.wall_ids.extend(wall_ids)
+        count = len(self.x) - start
+        self.normal_x.extend([self.wall_vectors[wall_id].x for wall_id in self.wall_ids[start:]])
+        self.normal_y.extend([self.wall_vectors[wall_id].y for wall_id in self.wall_ids[start:]])
+        self.active.extend(b'\x01' * count)
+        self.active_count += count
+        return start, start + count
+
+    def add_wall(self, wall_id, x_values, y_values): # Add the points of one wall
+        x_values = list(x_values)
+        self.wall_ranges[wall_id] = self.add_points(x_values, y_values, [wall_id] * len(x_values))
+
+    def __len__(self):
+        return self.active_count
+
+    def __iter__(self): # Iterate over the (point, vector) of the points that are not removed
+        x, y, wall_ids, wall_vectors = self.x, self.y, self.wall_ids, self.wall_vectors
+        for index in itertools.compress(range(len(x)), self.active):
+            yield Point(x[index], y[index]), wall_vectors[wall_ids[index]]
+
+    def copy(self) -> 'CandidateSet': # Copy with its own active mask, the point arrays are shared
+        candidate_set = CandidateSet.__new__(CandidateSet)
+        candidate_set.__dict__.update(self.__dict__)
+        candidate_set.active = bytearray(self.active)
+        return candidate_set
+
+    def remove(self, index):
+        if self.active[index]:
+            self.active[index] = 0
+            self.active_count -= 1
+
+    def get_active_indexes(self, start=0, end=None) -> list: # Get the indexes of the points between start and end that are not removed
+        if end is None:
+            end = len(self.x)
+        return list(itertools.compress(range(start, end), self.active[start:end]))
+
+    def get_point(self, index) -> Point:
+        return Point(self.x[index], self.y[index])
+
+    def get_vector(self, index) -> Vector:
+        return Vector(self.normal_x[index], self.normal_y[index])
+
+    def get_nearest(self, point: Point): # Get the index of the active point nearest to a point, None if there is none
+        x, y = self.x, self.y
+        point_x, point_y = point.x, point.y
+        return min(itertools.compress(range(len(x)), self.active),
+                   key=lambda index: (x[index] - point_x) ** 2 + (y[index] - point_y) ** 2, default=None)
+
+    def get_points_and_vectors(self, flatten=True) -> tuple:
+        # Get Point and Vector lists of the points that are not removed, per wall if flatten is False
+        if flatten:
+            points, vectors = [], []
+            for point, vector in self:
+                points.append(point)
+                vectors.append(vector)
+            return points, vectors
+        points = [[] for wall_id in range(len(self.wall_vectors))]
+        vectors = [[] for wall_id in range(len(self.wall_vectors))]
+        for wall_id, (start, end) in enumerate(self.wall_ranges):
+            for index in self.get_active_indexes(start, end):
+                points[wall_id].append(self.get_point(index))
+                vectors[wall_id].append(self.wall_vectors[wall_id])
+        return points, vectors
+
+# Define the LayoutInstrumentation class
+# Counts the candidates tried and the rejections by reason, and times each check of place_equipment
+# It is off by default, the layout then only pays for one attribute check per candidate
+class LayoutInstrumentation:
+    rejection_reasons = ('wall', 'equipment', 'clearance', 'door') # Door is a candidate in a door clearance
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.counters = {} # Dictionary of counter name to count
+        self.timers = {} # Dictionary of timer name to seconds
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name, start_time) -> float: # Add the time since start_time to a timer, returns the current time
+        now = time.perf_counter()
+        self.timers[name] = self.timers.get(name, 0.0) + now - start_time
+        return now
+
+    def get_summary(self) -> 'LayoutSummary':
+        return LayoutSummary(
+            candidates_tried=self.counters.get('candidates_tried', 0),
+            candidates_pruned=self.counters.get('candidates_pruned', 0),
+            placements=self.counters.get('placements', 0),
+            rejections={reason: self.counters.get(f'rejected_{reason}', 0) for reason in self.rejection_reasons},
+            check_seconds={name: self.timers.get(name, 0.0) for name in ('wall', 'equipment', 'clearance')},
+            layout_seconds=self.timers.get('layout', 0.0),
+        )
+
+# Define the LayoutSummary class
+class LayoutSummary:
+    def __init__(self, candidates_tried, candidates_pruned, placements, rejections, check_seconds, layout_seconds):
+        self.candidates_tried = candidates_tried # Calls to place_equipment
+        self.candidates_pruned = candidates_pruned # Candidates skipped by the candidate pruner
+        self.placements = placements
+        self.rejections = rejections # Dictionary of rejection reason to count
+        self.check_seconds = check_seconds # Dictionary of check (wall, equipment, clearance) to seconds
+        self.layout_seconds = layout_seconds
+
+    def to_dict(self) -> dict:
+        return {
+            'candidates_tried': self.candidates_tried,
+            'candidates_pruned': self.candidates_pruned,
+            'placements': self.placements,
+            'rejections': dict(self.rejections),
+            'check_seconds': dict(self.check_seconds),
+            'layout_seconds': self.layout_seconds,
+        }
+
+    def __str__(self):
+        rejections = ', '.join(f'{reason} {count}' for reason, count in self.rejections.items())
+        check_seconds = ', '.join(f'{name} {seconds:.4f}s' for name, seconds in self.check_seconds.items())
+        return (f'{self.candidates_tried} candidates tried, {self.candidates_pruned} pruned, {self.placements} placed\n'
+                f'Rejections: {rejections}\n'
+                f'Check time: {check_seconds}, layout {self.layout_seconds:.4f}s')
+
+# Define the CandidatePruner class
+# Candidate points that share a wall vector and a wall line only differ by their position along the line,
+# so for each footprint template the positions where it collides with an obstacle are intervals along the line
+# The intervals are exact box overlaps, so a pruned position would always have been rejected by place_equipment
+# Only obstacles across from a line can block it, so the obstacles are kept in strips across the lines
+# and the lines of each template and vector are kept sorted by position, a new line or obstacle only visits its neighbours
+class CandidatePruner:
+    cell_size = 2.0 # Width of the strips of the obstacle index in feet
+
+    def __init__(self):
+        # Obstacle strips keyed by (True, row) for lines along the x-axis and (False, column) for lines along the y-axis
+        # Each strip holds (box, True if it only blocks the equipment boxes of a candidate) entries
+        self.obstacle_cells = {}
+        self.lines = {} # Dictionary of (template, line) to [blocked intervals, merged blocked intervals or None]
+        self.line_positions = {} # Dictionary of (template, vector x, vector y) to [across min, across max, sorted line positions]
+
+    def get_cells(self, along_x: bool, across_min, across_max) -> list: # Get the strips overlapped by a range across the lines
+        return [(along_x, cell) for cell in range(math.floor(across_min / self.cell_size), math.floor(across_max / self.cell_size) + 1)]
+
+    def add_obstacles(self, boxes: list, equipment_only=False): # Add boxes that candidates cannot overlap
+        # equipment_only is True for clearance boxes, which only the equipment of a candidate cannot overlap
+        for box in boxes:
+            entry = (box, equipment_only)
+            for cell in self.get_cells(True, box.min_y, box.max_y) + self.get_cells(False, box.min_x, box.max_x):
+                if cell in self.obstacle_cells:
+                    self.obstacle_cells[cell].append(entry)
+                else:
+                    self.obstacle_cells[cell] = [entry]
+
+        # Only the lines where the template reaches across the box get new blocked intervals
+        for (template, vector_x, vector_y), (across_min, across_max, positions) in self.line_positions.items():
+            along_x = vector_x == 0
+            for box in boxes:
+                box_min, box_max = (box.min_y, box.max_y) if along_x else (box.min_x, box.max_x)
+                start = bisect.bisect_left(positions, box_min - across_max)
+                end = bisect.bisect_right(positions, box_max - across_min)
+                for line_position in positions[start:end]:
+                    line = (vector_x, vector_y, line_position)
+                    blocked = self.lines[(template, line)]
+                    blocked[0].extend(self.get_blocked_intervals(template, line, [box], equipment_only))
+                    blocked[1] = None
+
+    def add_line(self, template: 'FootprintTemplate', line: tuple) -> list: # Get the blocked intervals of a new line from the nearby obstacles
+        vector_x, vector_y, line_position = line
+        along_x = vector_x == 0
+        group_key = (template, vector_x, vector_y)
+        if group_key not in self.line_positions:
+            if along_x:
+                across_min, across_max = min(box.min_y for box in template.boxes), max(box.max_y for box in template.boxes)
+            else:
+                across_min, across_max = min(box.min_x for box in template.boxes), max(box.max_x for box in template.boxes)
+            self.line_positions[group_key] = [across_min, across_max, []]
+        across_min, across_max, positions = self.line_positions[group_key]
+        bisect.insort(positions, line_position)
+
+        boxes, equipment_only_boxes = [], []
+        seen = set()
+        for cell in self.get_cells(along_x, line_position + across_min, line_position + across_max):
+            for entry in self.obstacle_cells.get(cell, ()):
+                if id(entry) not in seen:
+                    seen.add(id(entry))
+                    (equipment_only_boxes if entry[1] else boxes).append(entry[0])
+        intervals = self.get_blocked_intervals(template, line, boxes, False)
+        intervals.extend(self.get_blocked_intervals(template, line, equipment_only_boxes, True))
+        return intervals
+
+    def get_line(self, point: 'Point', vector: 'Vector') -> tuple: # Get the line of a candidate point and its position along the line
+        if vector.x == 0: # The line runs along the x-axis
+            return (vector.x, vector.y, point.y), point.x
+        return (vector.x, vector.y, point.x), point.y
+
+    def get_blocked_intervals(self, template: 'FootprintTemplate', line: tuple, boxes: list, equipment_only: bool) -> list:
+        # Get the positions along the line where the template overlaps any of the boxes
+        vector_x, vector_y, line_position = line
+        along_x = vector_x == 0
+        margin = 1e-6 # The ends of each interval are left to place_equipment to avoid rounding differences
+        tolerance = 0.001
+        intervals = []
+        candidate_boxes = template.equipment_boxes if equipment_only else template.boxes
+        for candidate_box in candidate_boxes:
+            if along_x:
+                across_min, across_max = line_position + candidate_box.min_y, line_position + candidate_box.max_y
+                along_min, along_max = candidate_box.min_x, candidate_box.max_x
+            else:
+                across_min, across_max = line_position + candidate_box.min_x, line_position + candidate_box.max_x
+                along_min, along_max = candidate_box.min_y, candidate_box.max_y
+            for box in boxes:
+                # The overlap across the line and in height does not change along the line
+                if min(candidate_box.max_z, box.max_z) - max(candidate_box.min_z, box.min_z) <= tolerance:
+                    continue
+                if along_x:
+                    if min(across_max, box.max_y) - max(across_min, box.min_y) <= tolerance:
+                        continue
+                    start, end = box.min_x - along_max + tolerance, box.max_x - along_min - tolerance
+                else:
+                    if min(across_max, box.max_x) - max(across_min, box.min_x) <= tolerance:
+                        continue
+                    start, end = box.min_y - along_max + tolerance, box.max_y - along_min - tolerance
+                if end - start > 2 * margin:
+                    intervals.append((start + margin, end - margin))
+        return intervals
+
+    def is_blocked(self, template: 'FootprintTemplate', point: 'Point', vector: 'Vector') -> bool:
+        # Check if the template collides with an obstacle at a candidate point
+        line, position = self.get_line(point, vector)
+        key = (template, line)
+        blocked = self.lines.get(key)
+        if blocked is None:
+            blocked = [self.add_line(template, line), None]
+            self.lines[key] = blocked
+        if blocked[1] is None:
+            blocked[1] = merge_intervals(blocked[0])
+
+        # Find the last interval starting at or before the position
+        merged = blocked[1]
+        index = bisect.bisect_right(merged, (position, float('inf'))) - 1
+        return index >= 0 and merged[index][0] <= position <= merged[index][1]
+
+def get_wall_extents(box: Box, point: 'Point', vector: 'Vector') -> tuple:
+    # Get the extents of a box along a wall (u) and away from the wall into the room (v)
+    # u is the x or y coordinate along the wall, v is measured from the point on the wall along the wall normal vector
+    if vector.x == 0: # The wall runs along the x-axis
+        u_min, u_max = box.min_x, box.max_x
+        if vector.y > 0:
+            v_min, v_max = box.min_y - point.y, box.max_y - point.y
+        else:
+            v_min, v_max = point.y - box.max_y, point.y - box.min_y
+    else: # The wall runs along the y-axis
+        u_min, u_max = box.min_y, box.max_y
+        if vector.x > 0:
+            v_min, v_max = box.min_x - point.x, box.max_x - point.x
+        else:
+            v_min, v_max = point.x - box.max_x, point.x - box.min_x
+    return u_min, u_max, v_min, v_max
+
+def merge_intervals(intervals: list) -> list:
+    # Merge overlapping (start, end) intervals into a sorted list of disjoint intervals
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def get_intervals_length(intervals: list, excluded_intervals: list = ()) -> float:
+    # Get the total length of merged intervals, leaving out the parts covered by the excluded intervals
+    length = 0
+    for start, end in merge_intervals(intervals):
+        length += end - start
+        for excluded_start, excluded_end in excluded_intervals:
+            length -= max(0, min(end, excluded_end) - max(start, excluded_start))
+    return length
+
+def boxes_intersect(boxes: list, other_boxes: list) -> bool: # Check if any box in the first list overlaps any box in the second list
+    for box in boxes:
+        for other_box in other_boxes:
+            if box.intersects(other_box):
+                return True
+    return False
+
+# Define the BoxBackend class
+# The layout itself only uses boxes, a geometry backend builds the output geometry (equipment, doors and walls)
+# The box backend is pure Python so the layout runs without Rhino, its geometry is made of Box objects
+class BoxBackend:
+    def create_box(self, box: Box) -> Box:
+        return Box(box.min_x, box.min_y, box.min_z, box.max_x, box.max_y, box.max_z)
+
+    def duplicate(self, geometry: Box) -> Box:
+        return self.create_box(geometry)
+
+    def translate(self, geometry: Box, x, y): # Move the geometry in place
+        geometry.min_x += x
+        geometry.max_x += x
+        geometry.min_y += y
+        geometry.max_y += y
+
+    def rotate(self, geometry: Box, angle, center: Point): # Rotate the geometry in place around the Z-axis
+        # Rotations that are not a multiple of 90 degrees (the door leaf) keep the bounding box of the rotated box
+        cos_angle = math.cos(angle)
+        sin_angle = math.sin(angle)
+        xs = []
+        ys = []
+        for x in (geometry.min_x - center.x, geometry.max_x - center.x):
+            for y in (geometry.min_y - center.y, geometry.max_y - center.y):
+                xs.append(center.x + x * cos_angle - y * sin_angle)
+                ys.append(center.y + x * sin_angle + y * cos_angle)
+        geometry.min_x, geometry.max_x = min(xs), max(xs)
+        geometry.min_y, geometry.max_y = min(ys), max(ys)
+
+    def join(self, geometry: list) -> list: # Boxes are not joined
+        return geometry
+
+    def create_line(self, start: Point, end: Point) -> tuple: # A line is its start and end point
+        return (start, end)
+
+    def create_rectangle(self, min_x, min_y, max_x, max_y) -> Box: # A rectangle is a box without height
+        return Box(min_x, min_y, 0, max_x, max_y, 0)
+
+    def create_wall_geometry(self, interior_rectangle: Box, exterior_rectangle: Box, height, voids: list) -> tuple:
+        # The outline is one box per wall (south, north, west, east), the difference has the voids cut out
+        wall_thickness = interior_rectangle.min_x - exterior_rectangle.min_x
+        outline = create_wall_slab_boxes(interior_rectangle.min_x, interior_rectangle.min_y,
+                                         interior_rectangle.max_x, interior_rectangle.max_y, wall_thickness, height)
+        difference = outline
+        for void in voids:
+            difference_boxes = []
+            for box in difference:
+                difference_boxes.extend(box.subtract(void))
+            difference = difference_boxes
+        return outline, difference
+
+    def get_wall_faces(self, outline: list) -> tuple: # Get the (south, north, east, west) wall faces
+        return outline[0], outline[1], outline[3], outline[2]
+
+    def intersects(self, geometry, other_geometry) -> bool:
+        boxes = geometry if isinstance(geometry, list) else [geometry]
+        other_boxes = other_geometry if isinstance(other_geometry, list) else [other_geometry]
+        return boxes_intersect(boxes, other_boxes)
+
+# Define the RhinoBackend class
+# Builds Rhino Breps for the Grasshopper outputs
+class RhinoBackend:
+    def create_box(self, box: Box) -> 'Rhino.Geometry.Brep':
+        return Rhino.Geometry.Brep.CreateFromBox(
+            Rhino.Geometry.BoundingBox(box.min_x, box.min_y, box.min_z, box.max_x, box.max_y, box.max_z))
+
+    def duplicate(self, geometry: 'Rhino.Geometry.Brep') -> 'Rhino.Geometry.Brep':
+        return geometry.DuplicateBrep()
+
+    def translate(self, geometry: 'Rhino.Geometry.Brep', x, y): # Move the geometry in place
+        geometry.Translate(Rhino.Geometry.Vector3d(x, y, 0))
+
+    def rotate(self, geometry: 'Rhino.Geometry.Brep', angle, center: Point): # Rotate the geometry in place around the Z-axis
+        rotation_axis = Rhino.Geometry.Vector3d(0, 0, 1) # Z-axis
+        geometry.Rotate(angle, rotation_axis, center.to_gh_point())
+
+    def join(self, geometry: list) -> list:
+        result_breps = Rhino.Geometry.Brep.JoinBreps(geometry, 0.001)
+        if result_breps:
+            return [brep for brep in result_breps]
+        return geometry
+
+    def create_line(self, start: Point, end: Point) -> 'Rhino.Geometry.NurbsCurve':
+        return Rhino.Geometry.Line(start.to_gh_point(), end.to_gh_point()).ToNurbsCurve()
+
+    def create_rectangle(self, min_x, min_y, max_x, max_y) -> 'Rhino.Geometry.Rectangle3d':
+        return Rhino.Geometry.Rectangle3d(Rhino.Geometry.Plane.WorldXY,
+                                           Rhino.Geometry.Point3d(min_x, min_y, 0),
+                                           Rhino.Geometry.Point3d(max_x, max_y, 0))
+
+    def create_wall_geometry(self, interior_rectangle, exterior_rectangle, height, voids: list) -> tuple:
+        edges = [interior_rectangle.ToNurbsCurve(), exterior_rectangle.ToNurbsCurve()]
+        # Create a surface from both rectangles
+        surface = Rhino.Geometry.Brep.CreatePlanarBreps(edges, 0.001)[0]
+
+        # Extrude the surface to create the walls
+        outline_brep = Rhino.Geometry.Brep.CreateFromOffsetFace(surface.Faces[0], height, 0.001, False, True)
+
+        difference_brep = outline_brep
+        # Cut the door from the wall
+        for void_brep in voids:
+            difference_brep = list(Rhino.Geometry.Brep.CreateBooleanDifference(difference_brep, void_brep, 0.001))[0]
+
+        return outline_brep, difference_brep
+
+    def get_wall_faces(self, outline: 'Rhino.Geometry.Brep') -> tuple: # Get the (south, north, east, west) wall faces
+        return outline.Faces[9], outline.Faces[7], outline.Faces[8], outline.Faces[6]
+
+    def intersects(self, geometry: 'Rhino.Geometry.Brep', other_geometry: 'Rhino.Geometry.Brep') -> bool:
+        intersection_result = Rhino.Geometry.Brep.CreateBooleanIntersection(geometry, other_geometry, 0.001, False)
+        return bool(intersection_result)
+
+# The backend used to build output geometry, Rhino when it is available
+geometry_backend = RhinoBackend() if Rhino is not None else BoxBackend()
+
+def set_geometry_backend(backend):
+    # Set the backend used to build output geometry, geometry that was already built is kept per backend
+    global geometry_backend
+    geometry_backend = backend
+
+def create_wall_slab_boxes(min_x, min_y, max_x, max_y, wall_thickness, height) -> list:
+    # One box per wall around the interior (south, north, west, east), the south and north walls run the full exterior width
+    return [
+        Box(min_x - wall_thickness, min_y - wall_thickness, 0, max_x + wall_thickness, min_y, height), # South wall
+        Box(min_x - wall_thickness, max_y, 0, max_x + wall_thickness, max_y + wall_thickness, height), # North wall
+        Box(min_x - wall_thickness, min_y, 0, min_x, max_y, height), # West wall
+        Box(max_x, min_y, 0, max_x + wall_thickness, max_y, height), # East wall
+    ]
+
 # Define the Door class
 class Door:
     def __init__(self, width=3, height=inches_to_feet(80), position: Point = Point(0, 0), orientation: Vector = Vector(0, 1)):
@@ -59,12 +636,53 @@ class Door:
         self.orientation = orientation
         self.thickness = inches_to_feet(4) # Thickness of the door
 
-        self.door_geometry = self.create_rhino_geometry(door=True, clearance=False)
-        self.clearance_geometry = self.create_rhino_geometry(door=False, clearance=True)
-        self.geometry = [self.door_geometry, self.clearance_geometry]
-        self.void = self.create_rhino_void_geometry()
+        # The output geometry is built by the geometry backend the first time it is needed
+        self.rhino_geometry_cache = {}
+
+        self.clearance_boxes = self.create_clearance_boxes()
+        self.void_box = self.create_void_box()
+
+    def get_rhino_geometry(self, kind): # Get the door, clearance or void geometry from the geometry backend
+        key = (geometry_backend, kind)
+        if key not in self.rhino_geometry_cache:
+            if kind == 'door':
+                self.rhino_geometry_cache[key] = self.create_rhino_geometry(door=True, clearance=False)
+            elif kind == 'clearance':
+                self.rhino_geometry_cache[key] = self.create_rhino_geometry(door=False, clearance=True)
+            else:
+                self.rhino_geometry_cache[key] = self.create_rhino_void_geometry()
+        return self.rhino_geometry_cache[key]
+
+    @property
+    def door_geometry(self) -> list:
+        return self.get_rhino_geometry('door')
+
+    @property
+    def clearance_geometry(self) -> list:
+        return self.get_rhino_geometry('clearance')
+
+    @property
+    def geometry(self) -> list:
+        return [self.door_geometry, self.clearance_geometry]
+
+    @property
+    def void(self) -> 'Rhino.Geometry.Brep':
+        return self.get_rhino_geometry('void')
+
+    def create_clearance_boxes(self) -> list:
+        # Create the clearance box inside the room, this matches the clearance geometry of create_rhino_geometry
+        clearance_box = Box(self.position.x - self.width / 2, self.position.y, 0,
+                            self.position.x + self.width / 2, self.position.y + self.width, self.height)
+        return [clearance_box.rotate(self.position, self.orientation)]
+
+    def create_void_box(self) -> Box:
+        # Create the box cut from the wall, this matches create_rhino_void_geometry
+        wall_thickness = 0.5 # Thickness of the wall
+        void_box = Box(self.position.x - self.width / 2, self.position.y - wall_thickness, 0,
+                       self.position.x + self.width / 2, self.position.y, self.height)
+        return void_box.rotate(self.position, self.orientation)
 
-    def create_rhino_geometry(self, door=True, clearance=True) -> Rhino.Geometry.Brep:
+    def create_rhino_geometry(self, door=True, clearance=True) -> list:
         # Initialize a list to store the geometry
         equipment_geometry = []
         
@@ -77,14 +695,13 @@ class Door:
             min_z = 0 # min_z is the bottom of the door
             max_z = self.height # max_z is the top of the door
 
-            door_brep = Rhino.Geometry.Brep.CreateFromBox(Rhino.Geometry.BoundingBox(min_x, min_y, min_z, max_x, max_y, max_z)) # Create a box geometry for the door
+            door_brep = geometry_backend.create_box(Box(min_x, min_y, min_z, max_x, max_y, max_z)) # Create a box geometry for the door
             
             # Rotate the door 85 degrees around the Z-axis by the angle of orientation at the hinge
-            rotation_axis = Rhino.Geometry.Vector3d(0, 0, 1) # Z-axis
             rotation_angle = math.radians(135) # Rotate the door 85 degrees
 
-            hinge_point = Rhino.Geometry.Point3d(self.position.x + self.width / 2, self.position.y - self.thickness, 0) # Hinge point is the right side of the door
-            door_brep.Rotate(rotation_angle, rotation_axis, hinge_point) # Rotate the door around the hinge point
+            hinge_point = Point(self.position.x + self.width / 2, self.position.y - self.thickness) # Hinge point is the right side of the door
+            geometry_backend.rotate(door_brep, rotation_angle, hinge_point) # Rotate the door around the hinge point
 
             equipment_geometry.append(door_brep)
             # print('Door geometry created')
@@ -96,12 +713,11 @@ class Door:
             max_y = self.position.y + self.width
             min_z = 0
             max_z = self.height
-            clearance_brep = Rhino.Geometry.Brep.CreateFromBox(Rhino.Geometry.BoundingBox(min_x, min_y, min_z, max_x, max_y, max_z))
+            clearance_brep = geometry_backend.create_box(Box(min_x, min_y, min_z, max_x, max_y, max_z))
             equipment_geometry.append(clearance_brep)
             # print('Clearance geometry created')
         
         # Rotate the geometry around the Z-axis by the angle of orientation
-        rotation_axis = Rhino.Geometry.Vector3d(0, 0, 1) # Z-axis
         rotation_angle = self.orientation.get_angle(Vector(0, 1))
         # print(f'Rotation angle: {rotation_angle}')
 
@@ -111,11 +727,11 @@ class Door:
 
         if rotation_angle != 0:
             for brep in equipment_geometry:
-                brep.Rotate(rotation_angle, rotation_axis, self.position.to_gh_point())
+                geometry_backend.rotate(brep, rotation_angle, self.position)
 
         return equipment_geometry
     
-    def create_rhino_void_geometry(self) -> Rhino.Geometry.Brep:
+    def create_rhino_void_geometry(self) -> 'Rhino.Geometry.Brep':
         # Create a box geometry for the door
         wall_thickness = 0.5 # Thickness of the wall
         min_x = self.position.x - self.width / 2
@@ -124,49 +740,86 @@ class Door:
         max_y = self.position.y 
         min_z = 0
         max_z = self.height
-        door_brep = Rhino.Geometry.Brep.CreateFromBox(Rhino.Geometry.BoundingBox(min_x, min_y, min_z, max_x, max_y, max_z)) # Create a box geometry for the door
+        door_brep = geometry_backend.create_box(Box(min_x, min_y, min_z, max_x, max_y, max_z)) # Create a box geometry for the door
 
         # Rotate the geometry around the Z-axis by the angle of orientation
-        rotation_axis = Rhino.Geometry.Vector3d(0, 0, 1) # Z-axis
         rotation_angle = self.orientation.get_angle(Vector(0, 1))
 
         if self.orientation.x == 1 and self.orientation.y == 0:
             # print('Orientation is 1, 0')
             rotation_angle = math.radians(-90)
 
-        print(f'self.orientation: {self.orientation.x}, {self.orientation.y}')
+        logger.debug('Door orientation: %s, %s', self.orientation.x, self.orientation.y)
         # print(f'Rotation angle: {rotation_angle}')
 
         if rotation_angle != 0:
-            door_brep.Rotate(rotation_angle, rotation_axis, self.position.to_gh_point())
+            geometry_backend.rotate(door_brep, rotation_angle, self.position)
 
         return door_brep
     
     def rotate(self, angle): # Rotate the door by a given angle in radians
         self.orientation = self.orientation.rotate(angle)
         # Update the geometry after rotation
-        self.door_geometry = self.create_rhino_geometry(door=True, clearance=False)
-        self.clearance_geometry = self.create_rhino_geometry(door=False, clearance=True)
-        self.geometry = [self.door_geometry, self.clearance_geometry]
-        self.void = self.create_rhino_void_geometry()
+        self.rhino_geometry_cache = {}
+        self.clearance_boxes = self.create_clearance_boxes()
+        self.void_box = self.create_void_box()
 
     def orient(self, vector: Vector): # Orient the door to a given vector
         self.orientation = vector
         # Update the geometry after rotation
-        self.door_geometry = self.create_rhino_geometry(door=True, clearance=False)
-        self.clearance_geometry = self.create_rhino_geometry(door=False, clearance=True)
-        self.geometry = [self.door_geometry, self.clearance_geometry]
-        self.void = self.create_rhino_void_geometry()
+        self.rhino_geometry_cache = {}
+        self.clearance_boxes = self.create_clearance_boxes()
+        self.void_box = self.create_void_box()
 
     def set_position(self, position: Point): # Set the position of the door
         self.position = position
         # Update the geometry after rotation
-        self.door_geometry = self.create_rhino_geometry(door=True, clearance=False)
-        self.clearance_geometry = self.create_rhino_geometry(door=False, clearance=True)
-        self.void = self.create_rhino_void_geometry()
+        self.rhino_geometry_cache = {}
+        self.clearance_boxes = self.create_clearance_boxes()
+        self.void_box = self.create_void_box()
+
+# Define the FootprintTemplate class
+# The geometry of one equipment type in one orientation, built once at the origin and translated to each position
+class FootprintTemplate:
+    def __init__(self, equipment: 'ElectricalEquipment', orientation: Vector):
+        self.equipment = equipment # Equipment used to build the geometry
+        self.orientation = orientation
+
+        origin = Point(0, 0)
+        self.equipment_boxes = equipment.create_boxes(equipment=True, clearance=False, position=origin, orientation=orientation)
+        self.clearance_boxes = equipment.create_boxes(equipment=False, clearance=True, position=origin, orientation=orientation)
+        self.boxes = self.equipment_boxes + self.clearance_boxes
+
+        # The Breps are only built the first time they are needed, keyed by (geometry backend, equipment, clearance)
+        self.rhino_geometry = {}
+
+    def get_boxes(self, position: Point) -> tuple: # Get the equipment and clearance boxes moved to a position
+        equipment_boxes = [box.translate(position.x, position.y) for box in self.equipment_boxes]
+        clearance_boxes = [box.translate(position.x, position.y) for box in self.clearance_boxes]
+        return equipment_boxes, clearance_boxes
+
+    def get_template_geometry(self, equipment=True, clearance=True) -> list: # Get the shared Breps at the origin
+        key = (geometry_backend, equipment, clearance)
+        if key not in self.rhino_geometry:
+            self.rhino_geometry[key] = self.equipment.create_rhino_geometry(equipment=equipment, clearance=clearance,
+                                                                            position=Point(0, 0), orientation=self.orientation)
+        return self.rhino_geometry[key]
+
+    def get_rhino_geometry(self, position: Point, equipment=True, clearance=True) -> list: # Get a copy of the Breps moved to a position
+        geometry = []
+        for brep in self.get_template_geometry(equipment, clearance):
+            brep = geometry_backend.duplicate(brep)
+            geometry_backend.translate(brep, position.x, position.y)
+            geometry.append(brep)
+        return geometry
 
 # Define the ElectricalEquipment base class
 class ElectricalEquipment:
+    # Footprint templates shared by all equipment, keyed by dimensions, clearances and orientation
+    # Long running workers see many equipment sizes, so only the most recently used templates are kept
+    footprint_templates = collections.OrderedDict()
+    max_footprint_templates = 256
+
     def __init__(self, width, height, depth, name="", position: Point = Point(0, 0), front_clearance=3, side_clearance=0, rear_clearance=0, orientation: Vector = Vector(0, 1), geometry_copy_equipment=None, offset_from_floor=0, clearance_above: bool = False):
         self.width = width
         self.height = height
@@ -182,178 +835,153 @@ class ElectricalEquipment:
 
         self.orientation = orientation
 
-        self.clearance_geometry = self.create_rhino_geometry(clearance=True, equipment=False, geometry_copy_equipment=geometry_copy_equipment)
-        self.equipment_geometry = self.create_rhino_geometry(equipment=True, clearance=False, geometry_copy_equipment=geometry_copy_equipment)
-        self.geometry = self.create_rhino_geometry(equipment=True, clearance=True, geometry_copy_equipment=geometry_copy_equipment)
+        # Equipment created from geometry_copy_equipment shares its footprint templates
+        # The shared geometry is never modified, each instance only keeps its own position and orientation
+        self.geometry_copy_equipment = geometry_copy_equipment
+        self.rhino_geometry_cache = {} # Breps of this instance, built from the templates when they are first needed
+
+        self.update_boxes()
 
     def place(self):
         # Logic to place the equipment in the room
         pass
 
+    def to_spec(self) -> dict: # Get the dimensions and clearances of the equipment as a dictionary
+        return {
+            'type': self.__class__.__name__,
+            'name': self.name,
+            'width': self.width,
+            'height': self.height,
+            'depth': self.depth,
+            'front_clearance': self.front_clearance,
+            'side_clearance': self.side_clearance,
+            'rear_clearance': self.rear_clearance,
+            'offset_from_floor': self.offset_from_floor,
+            'clearance_above': self.clearance_above,
+        }
+
     def rotate(self, angle): # Rotate the equipment by a given angle in radians
         self.orientation = self.orientation.rotate(angle)
         # Update the geometry after rotation
-        self.clearance_geometry = self.create_rhino_geometry(clearance=True, equipment=False)
-        self.equipment_geometry = self.create_rhino_geometry(equipment=True, clearance=False)
-        self.geometry = self.create_rhino_geometry(equipment=True, clearance=True)
+        self.rhino_geometry_cache = {}
+        self.update_boxes()
 
     def orient(self, vector: Vector): # Orient the equipment to a given vector
         self.orientation = vector
         # Update the geometry after rotation
-        self.clearance_geometry = self.create_rhino_geometry(clearance=True, equipment=False)
-        self.equipment_geometry = self.create_rhino_geometry(equipment=True, clearance=False)
-        self.geometry = self.create_rhino_geometry(equipment=True, clearance=True)
+        self.rhino_geometry_cache = {}
+        self.update_boxes()
 
     def set_position(self, position: Point): # Set the position of the equipment
-        old_position = self.position
         self.position = position
-        # Update the geometry after rotation
-        # self.clearance_geometry = self.create_rhino_geometry(clearance=True, equipment=False)
-        # self.equipment_geometry = self.create_rhino_geometry(equipment=True, clearance=False)
-        # self.geometry = self.create_rhino_geometry(equipment=True, clearance=True)        
-
-        # Translate the geometry to the new position
-        translation_vector = Rhino.Geometry.Vector3d(position.x - old_position.x, position.y - old_position.y, 0)
-        
-        for brep in self.equipment_geometry:
-            brep.Translate(translation_vector)
-        for brep in self.clearance_geometry:
-            brep.Translate(translation_vector)
-        for brep in self.geometry:
-            brep.Translate(translation_vector)
+        # The Breps are rebuilt from the footprint template the next time they are needed
+        self.rhino_geometry_cache = {}
+        self.update_boxes()
+
+    def get_footprint_template(self, orientation: Vector = None) -> FootprintTemplate: # Get the cached footprint template for an orientation
+        if orientation is None:
+            orientation = self.orientation
+        if self.geometry_copy_equipment:
+            return self.geometry_copy_equipment.get_footprint_template(orientation)
+        # Orientations are multiples of 90 degrees, rounding removes floating point noise from Vector.rotate
+        orientation = Vector(round(orientation.x), round(orientation.y))
+
+        key = (self.width, self.height, self.depth, self.front_clearance, self.side_clearance, self.rear_clearance,
+               self.offset_from_floor, self.clearance_above, orientation.x, orientation.y)
+        templates = ElectricalEquipment.footprint_templates
+        template = templates.get(key)
+        if template is None:
+            template = FootprintTemplate(self, orientation)
+            templates[key] = template
+            if len(templates) > ElectricalEquipment.max_footprint_templates:
+                templates.popitem(last=False) # Drop the least recently used template
+        else:
+            templates.move_to_end(key)
+        return template
+
+    def get_rhino_geometry(self, equipment=True, clearance=True) -> list: # Get the Breps at the current position and orientation
+        key = (geometry_backend, equipment, clearance)
+        if key not in self.rhino_geometry_cache:
+            # Copy the shared template Breps and move the copies to the position of this instance
+            template = self.get_footprint_template()
+            self.rhino_geometry_cache[key] = template.get_rhino_geometry(self.position, equipment=equipment, clearance=clearance)
+        return self.rhino_geometry_cache[key]
+
+    @property
+    def equipment_geometry(self) -> list:
+        return self.get_rhino_geometry(equipment=True, clearance=False)
+
+    @property
+    def clearance_geometry(self) -> list:
+        return self.get_rhino_geometry(equipment=False, clearance=True)
+
+    @property
+    def geometry(self) -> list:
+        return self.get_rhino_geometry(equipment=True, clearance=True)
+
+    def update_boxes(self): # Update the boxes used for collision checks to the current position and orientation
+        self.equipment_boxes, self.clearance_boxes = self.get_footprint_template().get_boxes(self.position)
+        self.boxes = self.equipment_boxes + self.clearance_boxes
+
+    def create_boxes(self, equipment=True, clearance=True, position: Point = None, orientation: Vector = None) -> list:
+        # Create the axis-aligned boxes of the equipment and clearances, create_rhino_geometry builds its Breps from these
+        # The position and orientation default to the current position and orientation of the equipment
+        if position is None:
+            position = self.position
+        if orientation is None:
+            orientation = self.orientation
+
+        boxes = []
+        if equipment:
+            boxes.append(Box(position.x - self.width / 2, position.y + self.rear_clearance, self.offset_from_floor,
+                             position.x + self.width / 2, position.y + self.depth + self.rear_clearance, self.height))
 
+        if clearance:
+            if self.front_clearance > 0:
+                front_clearance_width = max(inches_to_feet(30), self.width)
+                front_clearance_height = max(6.5, self.height)
+                boxes.append(Box(position.x - front_clearance_width / 2, position.y + self.depth + self.rear_clearance, 0,
+                                 position.x + front_clearance_width / 2, position.y + self.depth + self.front_clearance + self.rear_clearance, front_clearance_height))
+            if self.side_clearance > 0:
+                boxes.append(Box(position.x - self.width / 2 - self.side_clearance, position.y + self.rear_clearance, 0,
+                                 position.x - self.width / 2, position.y + self.depth + self.rear_clearance, self.height))
+                boxes.append(Box(position.x + self.width / 2, position.y + self.rear_clearance, 0,
+                                 position.x + self.width / 2 + self.side_clearance, position.y + self.depth + self.rear_clearance, self.height))
+            if self.rear_clearance > 0:
+                boxes.append(Box(position.x - self.width / 2, position.y, 0,
+                                 position.x + self.width / 2, position.y + self.rear_clearance, self.height))
+            if self.clearance_above:
+                boxes.append(Box(position.x - self.width / 2, position.y + self.rear_clearance, self.height,
+                                 position.x + self.width / 2, position.y + self.depth + self.rear_clearance, 10))
+
+        # Rotate the boxes around the position so the front of the equipment faces the orientation
+        return [box.rotate(position, orientation) for box in boxes]
+
+
+    def create_rhino_geometry(self, equipment=True, clearance=True, geometry_copy_equipment=None, position: Point = None, orientation: Vector = None) -> list:
+        # The position and orientation default to the current position and orientation of the equipment
+        if position is None:
+            position = self.position
+        if orientation is None:
+            orientation = self.orientation
 
-    def create_rhino_geometry(self, equipment=True, clearance=True, geometry_copy_equipment=None) -> Rhino.Geometry.Brep:
         if geometry_copy_equipment:
-            if equipment == True and clearance == True:
-                return geometry_copy_equipment.geometry
-            elif equipment == True and clearance == False:
-                return geometry_copy_equipment.equipment_geometry
-            elif equipment == False and clearance == True:
-                return geometry_copy_equipment.clearance_geometry
+            # Copy the geometry so the other equipment is never modified
+            if equipment or clearance:
+                geometry_copy_equipment = geometry_copy_equipment.get_footprint_template(orientation)
+                return geometry_copy_equipment.get_rhino_geometry(position, equipment=equipment, clearance=clearance)
             else: 
                 return None
 
         else:
-            if equipment: # If equipment is True, create the equipment geometry
-                # Create a box geometry for the equipment
-                # Width should be centered at the position
-                min_x = self.position.x - self.width / 2 # min_x is the left side of the equipment
-                max_x = self.position.x + self.width / 2 # max_x is the right side of the equipment
-                min_y = self.position.y + self.rear_clearance # min_y is the rear side of the equipment (rear clearance is added)
-                max_y = self.position.y + self.depth + self.rear_clearance # max_y is the front side of the equipment (depth + rear clearance)
-                min_z = self.offset_from_floor # min_z is the bottom of the equipment
-                max_z = self.height # max_z is the top of the equipment
-                equipment_brep = Rhino.Geometry.Brep.CreateFromBox(
-                    Rhino.Geometry.BoundingBox(min_x, min_y, min_z, max_x, max_y, max_z)) # Create a box geometry for the equipment
-            
-            # Create clearance geometry
-            if clearance:
-                clearance_brep_list = [] # Initialize a list to store clearance geometry
-                if self.front_clearance > 0: 
-                    # Create a box geometry for the front clearance
-                    # front_clearance should be along the positive y-axis and offset from the equipment
-
-                    # front_clearance_width should be 30 inches or the width of the equipment
-                    front_clearance_width = max(inches_to_feet(30), self.width) # front clearance width should be the maximum of front clearance and width of the equipment
-
-                    # front_clearance_height should be the height of the equipment or 6.5 feet
-                    front_clearance_height = max(6.5, self.height) # front clearance height should be the maximum of front clearance and height of the equipment
-
-                    min_x = self.position.x - front_clearance_width / 2 # min_x is the left side of the equipment
-                    max_x = self.position.x + front_clearance_width / 2 # max_x is the right side of the equipment
-                    min_y = self.position.y + self.depth + self.rear_clearance # min_y is the front side of the equipment
-                    max_y = self.position.y + self.depth + self.front_clearance + self.rear_clearance # max_y is the front side of the equipment + front clearance
-                    min_z = 0 # min_z is the bottom of the equipment
-                    max_z = front_clearance_height # max_z is the top of the equipment
-                    front_clearance_brep = Rhino.Geometry.Brep.CreateFromBox(
-                        Rhino.Geometry.BoundingBox(min_x, min_y, min_z, max_x, max_y, max_z)) # Create a box geometry for the front clearance
-                    clearance_brep_list.append(front_clearance_brep)
-
-                if self.side_clearance > 0:
-                    # Create a box geometry for the left side clearance
-                    # side_clearance should be along the negative x-axis and offset from the equipment
-                    min_x = self.position.x - self.width / 2 - self.side_clearance # min_x is the left side of the equipment - side clearance
-                    max_x = self.position.x - self.width / 2 # max_x is the left side of the equipment
-                    min_y = self.position.y + self.rear_clearance # min_y is the rear side of the equipment
-                    max_y = self.position.y + self.depth + self.rear_clearance # max_y is the front side of the equipment
-                    min_z = 0 # min_z is the bottom of te equipment
-                    max_z = self.height # max_z is the top of the equipment
-                    left_clearance_brep = Rhino.Geometry.Brep.CreateFromBox(
-                        Rhino.Geometry.BoundingBox(min_x, min_y, min_z, max_x, max_y, max_z)) # Create a box geometry for the left side clearance
-
-                    # Create a box geometry for the right side clearance
-                    # side_clearance should be along the positive x-axis and offset from the equipment
-                    min_x = self.position.x + self.width / 2 # min_x is the right side of the equipment
-                    max_x = self.position.x + self.width / 2 + self.side_clearance # max_x is the right side of the equipment + side clearance
-                    min_y = self.position.y + self.rear_clearance # min_y is the rear side of the equipment
-                    max_y = self.position.y + self.depth + self.rear_clearance # max_y is the front side of the equipment
-                    min_z = 0 # min_z is the bottom of the equipment
-                    max_z = self.height # max_z is the top of the equipment
-                    # Create a box geometry for the right side clearance
-                    right_clearance_brep = Rhino.Geometry.Brep.CreateFromBox(
-                        Rhino.Geometry.BoundingBox(min_x, min_y, min_z, max_x, max_y, max_z)) 
-
-                    clearance_brep_list.append(left_clearance_brep)
-                    clearance_brep_list.append(right_clearance_brep)
-
-                if self.rear_clearance > 0: # If rear clearance is greater than 0
-                    # Create a box geometry for the rear clearance
-                    # rear_clearance should be along the negative y-axis and offset from the equipment
-                    min_x = self.position.x - self.width / 2 # min_x is the left side of the equipment
-                    max_x = self.position.x + self.width / 2 # max_x is the right side of the equipment
-                    min_y = self.position.y # min_y is the wall 
-                    max_y = self.position.y + self.rear_clearance # max_y is the rear side of the equipment
-                    min_z = 0
-                    max_z = self.height
-                    rear_clearance_brep = Rhino.Geometry.Brep.CreateFromBox(
-                        Rhino.Geometry.BoundingBox(min_x, min_y, min_z, max_x, max_y, max_z))
-                
-                    clearance_brep_list.append(rear_clearance_brep)
-
-                if self.clearance_above: # If clearance above is True
-                    # Create a box geometry for the clearance above
-                    # clearance_above should be along the positive z-axis and offset from the equipment above
-                    min_x = self.position.x - self.width / 2 # min_x is the left side of the equipment
-                    max_x = self.position.x + self.width / 2 # max_x is the right side of the equipment
-                    min_y = self.position.y + self.rear_clearance # min_y is the rear side of the equipment (rear clearance is added)
-                    max_y = self.position.y + self.depth + self.rear_clearance # max_y is the front side of the equipment (depth + rear clearance)
-                    min_z = self.height # min_z is the top of the equipment
-                    max_z = 10 # max_z is the top of the room
-                    clearance_above_brep = Rhino.Geometry.Brep.CreateFromBox(
-                        Rhino.Geometry.BoundingBox(min_x, min_y, min_z, max_x, max_y, max_z)) # Create a box geometry for the clearance above
-                    clearance_brep_list.append(clearance_above_brep)
-
-            equipment_geometry = []
-            if equipment:
-                equipment_geometry.append(equipment_brep)
-            if clearance:
-                for clearance_brep in clearance_brep_list:
-                    equipment_geometry.append(clearance_brep)
-
-            # Rotate the geometry around the Z-axis by the angle of orientation
-            rotation_axis = Rhino.Geometry.Vector3d(0, 0, 1) # Z-axis
-            # Angle in radians
-            rotation_angle = self.orientation.get_angle(Vector(0, 1)) 
-            
-            if self.orientation.x == 1 and self.orientation.y == 0:
-                # print('Orientation is 1, 0')
-                rotation_angle = math.radians(-90)
-            # print(f'Rotation angle: {rotation_angle}')
-
-            if rotation_angle != 0:
-                for brep in equipment_geometry:
-                    brep.Rotate(rotation_angle, 
-                                rotation_axis, self.position.to_gh_point())
-            
+            # Build a Brep from each box, the boxes are already rotated to the orientation
+            equipment_geometry = [geometry_backend.create_box(box)
+                                  for box in self.create_boxes(equipment, clearance, position, orientation)]
+
             # Combine the geometry if there are multiple breps
             if len(equipment_geometry) > 1:
-                result_breps = Rhino.Geometry.Brep.JoinBreps(equipment_geometry, 0.001)
-                if result_breps:
-                    equipment_geometry = []
-                    for brep in result_breps:
-                        equipment_geometry.append(brep)
-                print(f'Created {len(equipment_geometry)} breps')
+                equipment_geometry = geometry_backend.join(equipment_geometry)
+                logger.debug('Created %d breps', len(equipment_geometry))
 
             # Return the combined geometry
             return equipment_geometry
@@ -382,105 +1010,482 @@ class Transformer(ElectricalEquipment):
                          self.front_clearance, self.side_clearance, 
                          self.rear_clearance, geometry_copy_equipment=geometry_copy_equipment)
 
+# Equipment classes by name, used to create equipment from a spec
+equipment_types = {
+    'ElectricalEquipment': ElectricalEquipment,
+    'Panelboard': Panelboard,
+    'Transformer': Transformer,
+}
+
+def create_equipment_from_spec(spec: dict) -> ElectricalEquipment:
+    # Create equipment from the dictionary returned by ElectricalEquipment.to_spec
+    spec = dict(spec)
+    equipment_class = equipment_types[spec.pop('type')]
+    # The subclasses fix some of the clearances, so the base class initializer is used to keep every value from the spec
+    equipment = equipment_class.__new__(equipment_class)
+    ElectricalEquipment.__init__(equipment, **spec)
+    return equipment
+
+# Define the PlacementResult class
+# The name, type, position and orientation of one placed equipment, the primary output of a layout
+# Analysis runs only read the placements, the Breps are built from the footprint template the first time they are needed
+class PlacementResult:
+    def __init__(self, name, equipment_type, position: Point, orientation: Vector, footprint_template: FootprintTemplate = None):
+        self.name = name
+        self.equipment_type = equipment_type # Class name of the equipment, for example Panelboard
+        self.position = position
+        self.orientation = orientation
+        self.footprint_template = footprint_template # Template the Breps are built from, None if the result has no geometry
+
+        self.rhino_geometry_cache = {} # Breps of this placement keyed by (geometry backend, equipment, clearance)
+
+    @classmethod
+    def from_equipment(cls, equipment: ElectricalEquipment) -> 'PlacementResult':
+        return cls(equipment.name, equipment.__class__.__name__, equipment.position, equipment.orientation,
+                   equipment.get_footprint_template())
+
+    def to_dict(self) -> dict: # Get the placement as the dictionary taken by ElectricalRoom.apply_placements
+        return {
+            'name': self.name,
+            'type': self.equipment_type,
+            'x': self.position.x,
+            'y': self.position.y,
+            'orientation_x': self.orientation.x,
+            'orientation_y': self.orientation.y,
+        }
+
+    def get_rhino_geometry(self, equipment=True, clearance=True) -> list: # Get the Breps at the position of the placement
+        if self.footprint_template is None:
+            raise ValueError(f'Placement {self.name} has no footprint template to build geometry from')
+        key = (geometry_backend, equipment, clearance)
+        if key not in self.rhino_geometry_cache:
+            self.rhino_geometry_cache[key] = self.footprint_template.get_rhino_geometry(self.position, equipment=equipment, clearance=clearance)
+        return self.rhino_geometry_cache[key]
+
+    def build_geometry(self): # Build the equipment, clearance and combined Breps at once
+        self.get_rhino_geometry(equipment=True, clearance=False)
+        self.get_rhino_geometry(equipment=False, clearance=True)
+        self.get_rhino_geometry(equipment=True, clearance=True)
+
+    @property
+    def equipment_geometry(self) -> list:
+        return self.get_rhino_geometry(equipment=True, clearance=False)
+
+    @property
+    def clearance_geometry(self) -> list:
+        return self.get_rhino_geometry(equipment=False, clearance=True)
+
+    @property
+    def geometry(self) -> list:
+        return self.get_rhino_geometry(equipment=True, clearance=True)
+
+    def __repr__(self):
+        return (f'{self.equipment_type} {self.name} at ({self.position.x}, {self.position.y}) '
+                f'facing ({self.orientation.x}, {self.orientation.y})')
+
+def materialize_geometry(placement_results: list, thread_count=1) -> list:
+    # Build the Breps of the placement results, returns the results with their geometry cached
+    # The shared template Breps are built first, so with thread_count > 1 the threads only copy and move them
+    templates = {}
+    for placement_result in placement_results:
+        templates[id(placement_result.footprint_template)] = placement_result.footprint_template
+    for template in templates.values():
+        template.get_template_geometry(equipment=True, clearance=False)
+        template.get_template_geometry(equipment=False, clearance=True)
+        template.get_template_geometry(equipment=True, clearance=True)
+
+    if thread_count > 1 and len(placement_results) > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=thread_count) as executor:
+            list(executor.map(PlacementResult.build_geometry, placement_results))
+    else:
+        for placement_result in placement_results:
+            placement_result.build_geometry()
+    return placement_results
+
 # Define the ElectricalRoom class
 class ElectricalRoom:
     # Initialize the electrical room with necessary attributes (e.g., dimensions, list of equipment)
     # ...
-    def __init__(self, width, length, height=10):
+    def __init__(self, width, length, height=10, interior_rows=False):
         self.width = width
         self.length = length
         self.height = height
         self.equipment_list = []
+
+        # Also place equipment on rows inside the room once no point along the walls is left, see create_interior_candidate_set
+        self.interior_rows = interior_rows
         self.placed_equipment = []
 
         self.doors = []
 
-        self.interior_rectangle = self.create_interior_rectangle()
-        self.outline_geometry, self.difference_geometry = self.create_wall_geometry()
+        # Spatial indexes of the placed equipment and the clearances of placed equipment and doors
+        self.equipment_index = SpatialGrid()
+        self.clearance_index = SpatialGrid()
+
+        # Extents of the room interior (min_x, min_y, max_x, max_y) used for the layout
+        # Rooms built from the interior rectangle are always rectangular, set is_rectangular to False
+        # if the wall geometry is replaced so containment falls back to Brep booleans
+        self.interior_bounds = (-self.width / 2, -self.length / 2, self.width / 2, self.length / 2)
+        self.rectangular_walls = True # Backs is_rectangular, set before the candidate pruner exists
+
+        # The wall Breps are built by the geometry backend the first time they are needed, see get_wall_geometry
+        # The layout only uses the wall boxes, so adding doors does not run any Brep booleans
+        self.wall_geometry_cache = {}
+        self.wall_geometry_overrides = {} # Wall geometry replaced by the user keyed by kind, never rebuilt from the walls
+        self.wall_geometry_key = None
+
+        self.wall_boxes = self.create_wall_boxes()
 
-        self.south_wall_face = self.outline_geometry.Faces[9]
-        self.north_wall_face = self.outline_geometry.Faces[7]
-        self.east_wall_face = self.outline_geometry.Faces[8]
-        self.west_wall_face = self.outline_geometry.Faces[6]
+        self.candidate_pruner = self.create_candidate_pruner()
+
+        # Candidate points around the room keyed by (spacing, interior bounds), see get_candidate_set
+        self.candidate_sets = {}
+
+        # Counters and timers of the layout, set instrumentation.enabled to True to collect them
+        self.instrumentation = LayoutInstrumentation()
+
+        # Reason the last layout was skipped by the feasibility check, None if it ran
+        self.layout_failure_reason = None
     
     # Method to add equipment to the room
     def add_equipment(self, equipment: ElectricalEquipment, count=1) -> bool:
         for i in range(count):
             self.equipment_list.append(equipment)
         return True
+
+    # Method to get the room, doors and equipment as a dictionary
+    def to_spec(self) -> dict:
+        spec = {
+            'width': self.width,
+            'length': self.length,
+            'height': self.height,
+            'doors': [{'x': door.position.x, 'y': door.position.y} for door in self.doors],
+            'equipment': [equipment.to_spec() for equipment in self.equipment_list],
+        }
+        # Only set when used, so specs and cache keys of perimeter layouts stay the same
+        if self.interior_rows:
+            spec['interior_rows'] = True
+        return spec
+
+    # Method to get the placement results of the placed equipment, in the order it was placed
+    # No geometry is built, see materialize_geometry
+    def get_placement_results(self) -> list:
+        return [PlacementResult.from_equipment(equipment) for equipment in self.placed_equipment]
+
+    # Method to get the position and orientation of the placed equipment as dictionaries, in the order it was placed
+    def get_placements(self) -> list:
+        return [placement_result.to_dict() for placement_result in self.get_placement_results()]
+
+    # Method to remove all placed equipment from the room
+    def clear_layout(self):
+        self.placed_equipment = []
+        self.equipment_index = SpatialGrid()
+        self.clearance_index = SpatialGrid()
+        for door in self.doors:
+            for box in door.clearance_boxes:
+                self.clearance_index.insert(box, door)
+        self.candidate_pruner = self.create_candidate_pruner()
+
+    # Method to place equipment from the placements returned by get_placements
+    def apply_placements(self, placements: list):
+        equipment_by_name = {}
+        for equipment in self.equipment_list + self.placed_equipment:
+            equipment_by_name[equipment.name] = equipment
+
+        self.clear_layout()
+        for placement in placements:
+            equipment = equipment_by_name[placement['name']]
+            equipment.set_position(Point(placement['x'], placement['y']))
+            equipment.orient(Vector(placement['orientation_x'], placement['orientation_y']))
+            self.add_placed_equipment(equipment)
+
+    # Method to record equipment as placed and add its boxes to the spatial indexes
+    def add_placed_equipment(self, equipment: ElectricalEquipment):
+        self.placed_equipment.append(equipment)
+        for box in equipment.equipment_boxes:
+            self.equipment_index.insert(box, equipment)
+        for box in equipment.clearance_boxes:
+            self.clearance_index.insert(box, equipment)
+        self.candidate_pruner.add_obstacles(equipment.equipment_boxes)
+        self.candidate_pruner.add_obstacles(equipment.clearance_boxes, equipment_only=True)
+
+    # Method to check necessary conditions for the equipment to fit, without running the layout
+    # Returns (True, None) if the equipment may fit, otherwise (False, reason)
+    def check_feasibility(self) -> tuple:
+        # The bounds assume the rectangular room used to generate the candidate points
+        if not self.is_rectangular:
+            return True, None
+        min_x, min_y, max_x, max_y = self.interior_bounds
+        return check_room_feasibility(max_x - min_x, max_y - min_y, self.equipment_list, [door.width for door in self.doors],
+                                      self.interior_rows)
+
+    # Method to create the candidate pruner with the walls, doors and placed equipment as obstacles
+    def create_candidate_pruner(self) -> CandidatePruner:
+        candidate_pruner = CandidatePruner()
+        # The wall boxes are only exact for rectangular rooms, other rooms leave the wall check to place_equipment
+        if self.is_rectangular:
+            candidate_pruner.add_obstacles(self.wall_boxes)
+        for door in self.doors:
+            candidate_pruner.add_obstacles(door.clearance_boxes, equipment_only=True)
+        for equipment in self.placed_equipment:
+            candidate_pruner.add_obstacles(equipment.equipment_boxes)
+            candidate_pruner.add_obstacles(equipment.clearance_boxes, equipment_only=True)
+        return candidate_pruner
     
     def add_door_from_point(self, point: Point) -> bool:
         # Logic to add a door to the room
         # Return True if successful, False otherwise
+        # The door is not added if it overlaps another door
         door = Door()
-        self.doors.append(door)
-
-        points, vectors = self.generate_points_and_vectors(flatten=False)
+        if not self.snap_door_to_point(door, point):
+            logger.debug('No wall is long enough for a door')
+            return False
+        if self.overlaps_doors(door):
+            logger.debug('Door at Point %s, %s overlaps another door', door.position.x, door.position.y)
+            return False
 
-        door_width = door.width
-        point_spacing = 0.5 # Spacing between points
+        self.doors.append(door)
+        for box in door.clearance_boxes:
+            self.clearance_index.insert(box, door)
 
-        # Remove points that cannot fit the door, points that are too close to the corner
-        number_of_points_to_remove_from_each_corner = door_width / 2 / point_spacing
+        self.update_wall_geometry()
 
-        for edge_points, edge_vectors in zip(points, vectors):
-            for i in range(int(number_of_points_to_remove_from_each_corner)):
-                edge_points.pop(0)
-                edge_points.pop(-1)
-                edge_vectors.pop(0)
-                edge_vectors.pop(-1)
+        return True
 
-        # Flatten the points and vectors
-        points = [point for sublist in points for point in sublist]
-        vectors = [vector for sublist in vectors for vector in sublist]
+    # Method to check if a door opening or clearance overlaps the other doors of the room
+    def overlaps_doors(self, door: Door) -> bool:
+        door_boxes = door.clearance_boxes + [door.void_box]
+        for other_door in self.doors:
+            if other_door is not door and boxes_intersect(door_boxes, other_door.clearance_boxes + [other_door.void_box]):
+                return True
+        return False
+
+    # Method to move a door to the door position nearest to a point
+    # The door positions are the candidate points at least half a door width from the corners,
+    # the nearest one is found on each wall in closed form without creating the points
+    def snap_door_to_point(self, door: Door, point: Point) -> bool:
+        spacing = 0.5 # Spacing between points
+        min_x, min_y, max_x, max_y = self.interior_bounds
+        width_count = int((max_x - min_x) / spacing)
+        height_count = int((max_y - min_y) / spacing)
+        corner_count = int(door.width / 2 / spacing) # Points too close to each corner to fit the door
+
+        # For each wall in the order of the candidate set: the wall vector, the point of an index and the first and last index
+        # The points are computed as in create_candidate_set so the positions are the same
+        walls = [
+            (Vector(0, 1), lambda i: Point(min_x + i * spacing, min_y), corner_count, width_count - corner_count),
+            (Vector(0, -1), lambda i: Point(max_x - (width_count - 1 - i) * spacing, max_y), corner_count, width_count - 1 - corner_count),
+            (Vector(-1, 0), lambda i: Point(max_x, min_y + i * spacing), corner_count, height_count - 1 - corner_count),
+            (Vector(1, 0), lambda i: Point(min_x, max_y - (height_count - i) * spacing), corner_count, height_count - corner_count),
+        ]
+        # Position of index 0 along each wall, the index increases along x or y
+        wall_starts = [min_x, max_x - (width_count - 1) * spacing, min_y, max_y - height_count * spacing]
 
-        # Get nearest point and vector to the door point
         nearest_point = None
         nearest_vector = None
         min_distance = float('inf')
-        for p, v in zip(points, vectors):
-            distance = p.distance(point)
-            if distance < min_distance:
-                min_distance = distance
-                nearest_point = p
-                nearest_vector = v
-
-        print(f'Nearest point: {nearest_point.x}, {nearest_point.y}')
+        for (vector, get_point, first_index, last_index), wall_start in zip(walls, wall_starts):
+            if first_index > last_index:
+                continue # The wall is too short for the door
+            # Project the point onto the wall and check the two points around the projection, the lower one wins ties
+            position = point.x if vector.x == 0 else point.y
+            lower_index = math.floor((position - wall_start) / spacing)
+            for index in sorted(set(min(max(i, first_index), last_index) for i in (lower_index, lower_index + 1))):
+                wall_point = get_point(index)
+                distance = wall_point.distance(point)
+                if distance < min_distance:
+                    min_distance = distance
+                    nearest_point = wall_point
+                    nearest_vector = vector
+
+        # Return False if no wall is long enough for the door
+        if nearest_point is None:
+            return False
+        logger.debug('Nearest point: %s, %s', nearest_point.x, nearest_point.y)
         
         # Set the position and orientation of the door
         door.set_position(nearest_point)
         door.orient(nearest_vector)
+        return True
 
-        # Update the wall geometry
-        self.outline_geometry, self.difference_geometry = self.create_wall_geometry()
-        self.south_wall_face = self.outline_geometry.Faces[9]
-        self.north_wall_face = self.outline_geometry.Faces[7]
-        self.east_wall_face = self.outline_geometry.Faces[8]
-        self.west_wall_face = self.outline_geometry.Faces[6]
+    @property
+    def is_rectangular(self) -> bool:
+        return self.rectangular_walls
+
+    @is_rectangular.setter
+    def is_rectangular(self, value: bool):
+        # The candidate pruner only prunes against the wall boxes of rectangular rooms, so it is rebuilt for the new walls
+        self.rectangular_walls = value
+        self.update_wall_geometry()
+
+    # Method to rebuild the walls after the doors changed
+    # Only the wall boxes are rebuilt, the wall Breps are rebuilt by get_wall_geometry when they are needed again
+    def update_wall_geometry(self):
+        self.wall_boxes = self.create_wall_boxes()
+        self.candidate_pruner = self.create_candidate_pruner()
+
+    def get_wall_key(self) -> tuple: # Get the room dimensions and door parameters the wall geometry is built from
+        door_parameters = tuple((door.position.x, door.position.y, door.orientation.x, door.orientation.y, door.width, door.height)
+                                for door in self.doors)
+        return (self.width, self.length, self.height, door_parameters)
+
+    def update_wall_geometry_key(self):
+        # The cached and replaced geometry is dropped only when the room dimensions or the doors changed since it was built
+        wall_key = self.get_wall_key()
+        if wall_key != self.wall_geometry_key:
+            self.wall_geometry_cache = {}
+            self.wall_geometry_overrides = {}
+            self.wall_geometry_key = wall_key
+
+    def get_wall_geometry(self, kind): # Get the interior rectangle, outline, difference or faces geometry of the walls
+        self.update_wall_geometry_key()
+        if kind in self.wall_geometry_overrides:
+            return self.wall_geometry_overrides[kind]
+
+        key = (geometry_backend, kind)
+        if key not in self.wall_geometry_cache:
+            if kind == 'interior':
+                self.wall_geometry_cache[key] = self.create_interior_rectangle()
+            elif kind == 'faces':
+                self.wall_geometry_cache[key] = geometry_backend.get_wall_faces(self.outline_geometry)
+            else:
+                # The outline and the difference come from the same booleans, both are cached at once
+                outline_geometry, difference_geometry = self.create_wall_geometry()
+                self.wall_geometry_cache[(geometry_backend, 'outline')] = outline_geometry
+                self.wall_geometry_cache[(geometry_backend, 'difference')] = difference_geometry
+        return self.wall_geometry_cache[key]
+
+    @property
+    def interior_rectangle(self) -> 'Rhino.Geometry.Rectangle3d':
+        return self.get_wall_geometry('interior')
+
+    @property
+    def outline_geometry(self) -> 'Rhino.Geometry.Brep':
+        return self.get_wall_geometry('outline')
+
+    @property
+    def difference_geometry(self) -> 'Rhino.Geometry.Brep':
+        return self.get_wall_geometry('difference')
+
+    @difference_geometry.setter
+    def difference_geometry(self, geometry):
+        # Replacing the wall geometry keeps it until the room dimensions or the doors change
+        self.update_wall_geometry_key()
+        self.wall_geometry_overrides['difference'] = geometry
+
+    @property
+    def south_wall_face(self):
+        return self.get_wall_geometry('faces')[0]
+
+    @property
+    def north_wall_face(self):
+        return self.get_wall_geometry('faces')[1]
+
+    @property
+    def east_wall_face(self):
+        return self.get_wall_geometry('faces')[2]
+
+    @property
+    def west_wall_face(self):
+        return self.get_wall_geometry('faces')[3]
+
+    # Method to move a door without laying out the room again
+    # Only the placed equipment in the new door clearance is removed, it is then placed again around the existing layout
+    # Returns True if the door moved and all displaced equipment could be placed again
+    # Returns False if no wall fits the door, it overlaps another door or the displaced equipment does not fit,
+    # the door and the layout are then left as they were
+    def move_door(self, door: Door, point: Point) -> bool:
+        old_position, old_orientation = door.position, door.orientation
+        self.clearance_index.remove(door.clearance_boxes, door)
+        if not self.snap_door_to_point(door, point) or self.overlaps_doors(door):
+            logger.debug('Door cannot be moved to Point %s, %s', point.x, point.y)
+            self.set_door_placement(door, old_position, old_orientation)
+            return False
+        for box in door.clearance_boxes:
+            self.clearance_index.insert(box, door)
+
+        displaced_equipment = []
+        for equipment in self.placed_equipment:
+            if boxes_intersect(equipment.equipment_boxes, door.clearance_boxes):
+                displaced_equipment.append(equipment)
+        old_placements = [(equipment, equipment.position, equipment.orientation) for equipment in displaced_equipment]
+        for equipment in displaced_equipment:
+            self.remove_placed_equipment(equipment, update_pruner=False)
+        logger.debug('Door moved, %d equipment displaced', len(displaced_equipment))
+
+        # The walls are rebuilt for the new door opening, this also rebuilds the candidate pruner
+        self.update_wall_geometry()
+
+        remaining_equipment = self.layout_equipment_list(displaced_equipment)
+        if len(remaining_equipment) == 0:
+            return True
 
-        return True
+        # Put the door and the displaced equipment back where they were
+        logger.debug('Door cannot be moved to Point %s, %s, %d equipment does not fit', point.x, point.y, len(remaining_equipment))
+        for equipment in displaced_equipment:
+            if equipment not in remaining_equipment:
+                self.remove_placed_equipment(equipment, update_pruner=False)
+        self.clearance_index.remove(door.clearance_boxes, door)
+        self.set_door_placement(door, old_position, old_orientation)
+        for equipment, position, orientation in old_placements:
+            equipment.set_position(position)
+            equipment.orient(orientation)
+            self.add_placed_equipment(equipment)
+        self.update_wall_geometry()
+        return False
+
+    # Method to set the position and orientation of a door that is not in the clearance index and add it back
+    def set_door_placement(self, door: Door, position: Point, orientation: Vector):
+        door.set_position(position)
+        door.orient(orientation)
+        for box in door.clearance_boxes:
+            self.clearance_index.insert(box, door)
+
+    # Method to add equipment and place it around the existing layout
+    # Returns True if the equipment could be placed
+    def add_and_place_equipment(self, equipment: ElectricalEquipment) -> bool:
+        self.add_equipment(equipment)
+        remaining_equipment = self.layout_equipment_list([equipment])
+        return len(remaining_equipment) == 0
+
+    # Method to remove equipment from the room, the rest of the layout stays valid
+    def remove_equipment(self, equipment: ElectricalEquipment):
+        if equipment in self.equipment_list:
+            self.equipment_list.remove(equipment)
+        if equipment in self.placed_equipment:
+            self.remove_placed_equipment(equipment)
+
+    # Method to remove equipment from the placed equipment and the spatial indexes
+    def remove_placed_equipment(self, equipment: ElectricalEquipment, update_pruner=True):
+        self.placed_equipment.remove(equipment)
+        self.equipment_index.remove(equipment.equipment_boxes, equipment)
+        self.clearance_index.remove(equipment.clearance_boxes, equipment)
+        # Blocked intervals cannot be taken out of the candidate pruner, so it is created again
+        if update_pruner:
+            self.candidate_pruner = self.create_candidate_pruner()
+
+    # Method to get the equipment that is not placed, in the order of the equipment list
+    def get_unplaced_equipment(self) -> list:
+        placed_ids = set(id(equipment) for equipment in self.placed_equipment)
+        return [equipment for equipment in self.equipment_list if id(equipment) not in placed_ids]
     
-    def create_interior_rectangle(self) -> Rhino.Geometry.Rectangle3d:
+    def create_interior_rectangle(self) -> 'Rhino.Geometry.Rectangle3d':
         # Create a rectangle for the room
         min_x = -self.width / 2
         max_x = self.width / 2
         min_y = -self.length / 2
         max_y = self.length / 2
 
-        return Rhino.Geometry.Rectangle3d(Rhino.Geometry.Plane.WorldXY, 
-                                           Rhino.Geometry.Point3d(min_x, min_y, 0), 
-                                           Rhino.Geometry.Point3d(max_x, max_y, 0))
+        return geometry_backend.create_rectangle(min_x, min_y, max_x, max_y)
     
-    def create_exterior_rectangle(self, wall_thickness) -> Rhino.Geometry.Rectangle3d:
+    def create_exterior_rectangle(self, wall_thickness) -> 'Rhino.Geometry.Rectangle3d':
         # Create a rectangle for the room
         min_x = -self.width / 2 - wall_thickness
         max_x = self.width / 2 + wall_thickness
         min_y = -self.length / 2 - wall_thickness
         max_y = self.length / 2 + wall_thickness
 
-        return Rhino.Geometry.Rectangle3d(Rhino.Geometry.Plane.WorldXY,
-                                           Rhino.Geometry.Point3d(min_x, min_y, 0), 
-                                           Rhino.Geometry.Point3d(max_x, max_y, 0))
+        return geometry_backend.create_rectangle(min_x, min_y, max_x, max_y)
 
     # Method to create the wall geometry of the room
     def create_wall_geometry(self) -> tuple:
@@ -490,338 +1495,1537 @@ class ElectricalRoom:
         interior_rectangle = self.interior_rectangle
         exterior_rectangle = self.create_exterior_rectangle(wall_thickness)
 
-        edges = [interior_rectangle.ToNurbsCurve(), exterior_rectangle.ToNurbsCurve()]
-        # Create a surface from both rectangles
-        surface = Rhino.Geometry.Brep.CreatePlanarBreps(edges, 0.001)[0]
+        # Extrude the walls between both rectangles and cut the doors from the wall
+        voids = [door.void for door in self.doors]
+        return geometry_backend.create_wall_geometry(interior_rectangle, exterior_rectangle, self.height, voids)
+    
+    # Method to create the boxes of the wall solid used for collision checks
+    def create_wall_boxes(self) -> list:
+        wall_thickness = 0.5 # Thickness of the wall
+        min_x = -self.width / 2
+        max_x = self.width / 2
+        min_y = -self.length / 2
+        max_y = self.length / 2
 
-        # Extrude the surface to create the walls
-        outline_brep = Rhino.Geometry.Brep.CreateFromOffsetFace(surface.Faces[0], self.height, 0.001, False, True)
+        # One box per wall, the south and north walls run the full exterior width
+        wall_boxes = create_wall_slab_boxes(min_x, min_y, max_x, max_y, wall_thickness, self.height)
 
-        difference_brep = outline_brep
-        # Cut the door from the wall
+        # Cut the doors from the wall
         for door in self.doors:
-            void_brep = door.void
-            difference_brep = list(Rhino.Geometry.Brep.CreateBooleanDifference(difference_brep, void_brep, 0.001))[0]
-            
-        return outline_brep, difference_brep
-    
-    # Method to generate points and vectors around the room
-    def generate_points_and_vectors(self, flatten=True, spacing=0.5) -> tuple:
-        # Create Points and Vectors around the room
-        points = []
-        vectors = []
+            difference_boxes = []
+            for wall_box in wall_boxes:
+                difference_boxes.extend(wall_box.subtract(door.void_box))
+            wall_boxes = difference_boxes
+
+        return wall_boxes
+
+    # Method to check if boxes are inside the room and do not intersect the walls
+    def contains_boxes(self, boxes: list, tolerance=0.001) -> bool:
+        if not self.is_rectangular:
+            # Fall back to Brep booleans against the wall geometry
+            for box in boxes:
+                if geometry_backend.intersects(self.difference_geometry, geometry_backend.create_box(box)):
+                    return False
+            return True
 
-        # Create points around the interior rectangle
-        # spacing = 0.5 # Spacing between points
-        interior_rectangle = self.interior_rectangle
+        min_x, min_y, max_x, max_y = self.interior_bounds
+        for box in boxes:
+            # Boxes inside the interior bounds can never reach the walls
+            if (box.min_x >= min_x - tolerance and box.max_x <= max_x + tolerance and
+                    box.min_y >= min_y - tolerance and box.max_y <= max_y + tolerance):
+                continue
+            # The box reaches into the wall, which is only allowed through a door void
+            for wall_box in self.wall_boxes:
+                if box.intersects(wall_box, tolerance):
+                    return False
+        return True
 
-        # Create points along the edges of the rectangle
-        # It is important to note that the points are created in a clockwise direction
+    # Method to generate points and vectors around the room
+    def get_candidate_set(self, spacing=0.5) -> CandidateSet:
+        # Get the candidate points around the room, the set is built once for each spacing
+        key = (spacing, self.interior_bounds)
+        candidate_set = self.candidate_sets.get(key)
+        if candidate_set is None:
+            candidate_set = self.create_candidate_set(spacing)
+            self.candidate_sets[key] = candidate_set
+        return candidate_set
+
+    def create_candidate_set(self, spacing=0.5) -> CandidateSet:
+        # Create points around the interior rectangle
+        # Use the extents of the interior rectangle
+        min_x, min_y, max_x, max_y = self.interior_bounds
+        interior_width = max_x - min_x
+        interior_height = max_y - min_y
+        width_count = int(interior_width / spacing)
+        height_count = int(interior_height / spacing)
+
+        # Create points along the edges of the rectangle, in the order of the walls of CandidateSet
         # Starting from the bottom left corner
+        candidate_set = CandidateSet()
+        # Bottom edge from left to right
+        candidate_set.add_wall(0, [min_x + i * spacing for i in range(width_count + 1)], [min_y] * (width_count + 1))
+        # Top edge from left to right, the last point is the top right corner
+        candidate_set.add_wall(1, [max_x - i * spacing for i in reversed(range(width_count))], [max_y] * width_count)
+        # Right edge from bottom to top
+        candidate_set.add_wall(2, [max_x] * height_count, [min_y + i * spacing for i in range(height_count)])
+        # Left edge from bottom to top, the last point is the top left corner
+        candidate_set.add_wall(3, [min_x] * (height_count + 1), [max_y - i * spacing for i in reversed(range(height_count + 1))])
+
+        logger.debug('Candidate points: bottom %d, top %d, right %d, left %d',
+                     width_count + 1, width_count, height_count, height_count + 1)
+        return candidate_set
+
+    def get_interior_candidate_set(self, spacing=0.5) -> CandidateSet:
+        # Get the candidate points of the interior rows, built once for each spacing like get_candidate_set
+        key = ('interior', spacing, self.interior_bounds)
+        candidate_set = self.candidate_sets.get(key)
+        if candidate_set is None:
+            candidate_set = self.create_interior_candidate_set(spacing)
+            self.candidate_sets[key] = candidate_set
+        return candidate_set
+
+    def create_interior_candidate_set(self, spacing=0.5) -> CandidateSet:
+        # Create rows of points inside the room on the same grid as the points along the walls
+        # Each row is a line the equipment backs onto, every point faces both ways across the line,
+        # so equipment is placed back to back along a row, or free standing with its rear clearance on the line
+        # The rows are ordered from the middle of the room outwards, rows along the longer side first,
+        # so islands start in the middle and leave aisles to the equipment along the walls
+        min_x, min_y, max_x, max_y = self.interior_bounds
+        width_count = int((max_x - min_x) / spacing)
+        height_count = int((max_y - min_y) / spacing)
+        center_x = (min_x + max_x) / 2
+        center_y = (min_y + max_y) / 2
+
+        rows = []
+        along_x_first = max_x - min_x >= max_y - min_y
+        for j in range(1, height_count):
+            y = min_y + j * spacing
+            rows.append((abs(y - center_y), not along_x_first, y, True))
+        for i in range(1, width_count):
+            x = min_x + i * spacing
+            rows.append((abs(x - center_x), along_x_first, x, False))
+        rows.sort()
+
+        candidate_set = CandidateSet()
+        for distance, priority, line_position, along_x in rows:
+            if along_x: # Equipment faces up and down the room from the row
+                x_values = [min_x + i * spacing for i in range(width_count + 1) for wall_id in (0, 1)]
+                candidate_set.add_points(x_values, [line_position] * len(x_values), [0, 1] * (width_count + 1))
+            else: # Equipment faces across the room from the row
+                y_values = [min_y + j * spacing for j in range(height_count + 1) for wall_id in (3, 2)]
+                candidate_set.add_points([line_position] * len(y_values), y_values, [3, 2] * (height_count + 1))
+
+        logger.debug('Interior candidate points: %d on %d rows', len(candidate_set), len(rows))
+        return candidate_set
 
-        # Create points along the bottom edge
-        bottom_points = []
-        bottom_vectors = []
-        for i in range(int(interior_rectangle.Width / spacing) + 1):
-            bottom_points.append(Point(interior_rectangle.Corner(0).X + i * spacing, interior_rectangle.Corner(0).Y))
-            bottom_vectors.append(Vector(0, 1))
-        # Create points along the top edge
-        top_points = []
-        top_vectors = []
-        for i in range(int(interior_rectangle.Width / spacing)):
-            top_points.append(Point(interior_rectangle.Corner(2).X - i * spacing, interior_rectangle.Corner(2).Y))
-            top_vectors.append(Vector(0, -1))
-        # Reverse the top points and vectors
-        top_points.reverse()
-        top_vectors.reverse()
-        # Create points along the right edge
-        right_points = []
-        right_vectors = []
-        for i in range(int(interior_rectangle.Height / spacing)):
-            right_points.append(Point(interior_rectangle.Corner(1).X, interior_rectangle.Corner(1).Y + i * spacing))
-            right_vectors.append(Vector(-1, 0))
-        # Create points along the left edge
-        left_points = []
-        left_vectors = []
-        for i in range(int(interior_rectangle.Height / spacing) + 1):
-            left_points.append(Point(interior_rectangle.Corner(3).X, interior_rectangle.Corner(3).Y - i * spacing))
-            left_vectors.append(Vector(1, 0))
-        # Reverse the left points and vectors
-        left_points.reverse()
-        left_vectors.reverse()
-
-        print(f'len(bottom_points): {len(bottom_points)}')
-        print(f'len(top_points): {len(top_points)}')
-        print(f'len(right_points): {len(right_points)}')
-        print(f'len(left_points): {len(left_points)}')
-
-        if flatten:
-            points = bottom_points + top_points + right_points + left_points
-            vectors = bottom_vectors + top_vectors + right_vectors + left_vectors
-        else:
-            points = [bottom_points, top_points, right_points, left_points]
-            vectors = [bottom_vectors, top_vectors, right_vectors, left_vectors]
-
-        return points, vectors
+    def generate_points_and_vectors(self, flatten=True, spacing=0.5) -> tuple:
+        # Create Points and Vectors around the room, as flat lists or as a list for each edge if flatten is False
+        # The layout reads the candidate set directly, this builds the objects for other callers
+        return self.get_candidate_set(spacing).get_points_and_vectors(flatten)
     
     def place_equipment(self, point, vector, equipment: ElectricalEquipment) -> bool:
         # Logic to place the equipment in the room
         # Return True if successful, False otherwise
-        
-        # Update the position of the equipment
-        old_position = equipment.position
-        equipment.set_position(point)
-        old_vector = equipment.orientation
-        equipment.orient(vector)
 
-        def revert_position():
-            equipment.set_position(old_position)
-            equipment.orient(old_vector)
+        # Move the footprint template of the equipment to the candidate position and orientation
+        # The equipment itself is only moved once all checks pass
+        template = equipment.get_footprint_template(vector)
+        candidate_equipment_boxes, candidate_clearance_boxes = template.get_boxes(point)
+        candidate_boxes = candidate_equipment_boxes + candidate_clearance_boxes
+
+        instrumentation = self.instrumentation
+        if instrumentation.enabled:
+            instrumentation.count('candidates_tried')
+            start_time = time.perf_counter()
 
         # Check if equipment and clearance geometry intersect with the wall geometry
         # If they do, return False
-        wall_intersection = False
-
-        for e_geometry in equipment.geometry:
-            intersection_result = Rhino.Geometry.Brep.CreateBooleanIntersection(self.difference_geometry, e_geometry, 0.001, False)
-            if intersection_result:
-                wall_intersection = True
-                break
-        if wall_intersection:
-            print(f'Equipment {equipment.name} intersects with wall geometry at Point {point.x}, {point.y}')
-            revert_position()
+        if not self.contains_boxes(candidate_boxes):
+            if instrumentation.enabled:
+                instrumentation.add_time('wall', start_time)
+                instrumentation.count('rejected_wall')
+            logger.debug('Equipment %s intersects with wall geometry at Point %s, %s', equipment.name, point.x, point.y)
             return False
-        else:
-            print(f'Equipment {equipment.name} does not intersect with wall geometry')
+        if instrumentation.enabled:
+            start_time = instrumentation.add_time('wall', start_time)
         
         # Check if equipment and clearance geometry intersect with other equipment
+        # Only the placed equipment near the candidate is checked using the spatial index
         # If they do, return False
-        for placed_equipment in self.placed_equipment:
-            for placed_geometry in placed_equipment.equipment_geometry:
-                for e_geometry in equipment.geometry:
-                    intersection_result = Rhino.Geometry.Brep.CreateBooleanIntersection(placed_geometry, e_geometry, 0.001, False)
-                    if intersection_result:
-                        print(f'Equipment {equipment.name} intersects with other equipment at Point {point.x}, {point.y}')
-                        revert_position()
-                        return False
-                    else:
-                        print(f'Equipment {equipment.name} does not intersect with other equipment')
-
-        # Check if equipment geometry intersects with other clearance geometry
+        if self.equipment_index.intersects(candidate_boxes):
+            if instrumentation.enabled:
+                instrumentation.add_time('equipment', start_time)
+                instrumentation.count('rejected_equipment')
+            logger.debug('Equipment %s intersects with other equipment at Point %s, %s', equipment.name, point.x, point.y)
+            return False
+        if instrumentation.enabled:
+            start_time = instrumentation.add_time('equipment', start_time)
+
+        # Check if equipment geometry intersects with other clearance geometry, including door clearances
         # If they do, return False
-        for placed_equipment in self.placed_equipment + self.doors:
-            for placed_geometry in placed_equipment.clearance_geometry:
-                for e_geometry in equipment.equipment_geometry:
-                    intersection_result = Rhino.Geometry.Brep.CreateBooleanIntersection(placed_geometry, e_geometry, 0.001, False)
-                    if intersection_result:
-                        print(f'Equipment {equipment.name} intersects with other clearance geometry at Point {point.x}, {point.y}')
-                        revert_position()
-                        return False
-                    else:
-                        print(f'Equipment {equipment.name} does not intersect with other clearance geometry')
-        # If all checks pass, return True
-        print(f'Equipment {equipment.name} placed successfully')
+        if instrumentation.enabled:
+            # Find the clearance that is hit so the rejection can be counted as a door or equipment clearance
+            entry = self.clearance_index.find_intersection(candidate_equipment_boxes)
+            instrumentation.add_time('clearance', start_time)
+            if entry is not None:
+                instrumentation.count('rejected_door' if isinstance(entry[1], Door) else 'rejected_clearance')
+            blocked = entry is not None
+        else:
+            blocked = self.clearance_index.intersects(candidate_equipment_boxes)
+        if blocked:
+            logger.debug('Equipment %s intersects with other clearance geometry at Point %s, %s', equipment.name, point.x, point.y)
+            return False
+
+        # If all checks pass, update the position of the equipment, this also builds the Breps used for the output
+        equipment.set_position(point)
+        equipment.orient(vector)
+        if instrumentation.enabled:
+            instrumentation.count('placements')
+        logger.debug('Equipment %s placed successfully', equipment.name)
         return True
 
     # Method to layout the equipment in the room
-    def layout_equipment(self, shuffle=False) -> bool:
+    def layout_equipment(self, shuffle=False, seed=None) -> bool:
         # Logic to layout the equipment in the room
         # Return True if successful, False otherwise
-        # Create Points and Vectors around the room
-        points, vectors = self.generate_points_and_vectors()
+        # The seed makes the shuffled order reproducible, without it the global random state is used
+        # Stop before trying any point if the equipment cannot fit
+        feasible, self.layout_failure_reason = self.check_feasibility()
+        if not feasible:
+            logger.debug('Layout skipped: %s', self.layout_failure_reason)
+            return False
 
-        equipment_list = self.equipment_list
-        for equipment in equipment_list: print(equipment.name)
+        instrumentation = self.instrumentation
+        if instrumentation.enabled:
+            layout_start_time = time.perf_counter()
+
+        equipment_list = list(self.equipment_list)
         if shuffle:
-            equipment_list = random.sample(equipment_list, len(equipment_list)) # Shuffle the equipment list
-            print('Equipment list shuffled')
-        for equipment in equipment_list: print(equipment.name)
-        # Place the equipment in the room one by one using the list of points and vectors
-        for point, vector in zip(points, vectors):
-            for equipment in equipment_list:
-                if self.place_equipment(point, vector, equipment):
-                    # If the equipment is placed successfully, add it to the placed equipment list
-                    self.placed_equipment.append(equipment)
-                    print(f'Equipment {equipment.name} placed at Point {point.x}, {point.y}')
-                    equipment_list.remove(equipment)
-                    break
+            random_generator = random if seed is None else random.Random(seed)
+            equipment_list = random_generator.sample(equipment_list, len(equipment_list)) # Shuffle the equipment list
+            logger.debug('Equipment list shuffled')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Equipment order: %s', ', '.join(equipment.name for equipment in equipment_list))
+        equipment_list = self.layout_equipment_list(equipment_list)
+
+        if instrumentation.enabled:
+            instrumentation.add_time('layout', layout_start_time)
         
         if len(equipment_list) == 0:
-            print('All equipment placed successfully')
+            logger.debug('All equipment placed successfully')
             return True
         else:
-            print('Not all equipment placed successfully')
+            logger.debug('Not all equipment placed successfully')
             return False
-        
-    def calculate_blocked_walls_distance(self) -> tuple:
+
+    # Method to place a list of equipment around the equipment already placed
+    # Returns the equipment that could not be placed
+    def layout_equipment_list(self, equipment_list: list) -> list:
+        instrumentation = self.instrumentation
+
+        # Equipment sharing a footprint template passes or fails the same checks at a point,
+        # so the equipment is grouped by template and only the first unplaced equipment of each group is tried,
+        # in the order of the equipment list
+        # Each group is [index of its first unplaced equipment, list of (index in the equipment list, equipment), templates by vector]
+        groups = {}
+        for index, equipment in enumerate(equipment_list):
+            template = equipment.get_footprint_template(CandidateSet.wall_vectors[0])
+            if template in groups:
+                groups[template][1].append((index, equipment))
+            else:
+                groups[template] = [0, [(index, equipment)], {}]
+        groups = list(groups.values())
+        remaining_count = len(equipment_list)
+
+        # Place the equipment in the room one by one using the candidate points and vectors around the room
+        # With interior rows the equipment that does not fit along the walls is placed on the rows inside the room
+        # Every candidate only costs a lookup in the candidate pruner and the spatial indexes for each group,
+        # so the interior rows add a constant cost per point instead of a check against all the equipment
+        candidate_sets = [self.get_candidate_set()]
+        if self.interior_rows:
+            candidate_sets.append(self.get_interior_candidate_set())
+        for point, vector in itertools.chain.from_iterable(candidate_sets):
+            if remaining_count == 0:
+                break
+            group_order = sorted((group[1][group[0]][0], group_index) for group_index, group in enumerate(groups) if group[0] < len(group[1]))
+            for equipment_index, group_index in group_order:
+                group = groups[group_index]
+                equipment = group[1][group[0]][1]
+                template = group[2].get(vector)
+                if template is None:
+                    template = equipment.get_footprint_template(vector)
+                    group[2][vector] = template
+                # Skip positions where the template is known to collide with the walls, doors or placed equipment
+                if self.candidate_pruner.is_blocked(template, point, vector):
+                    if instrumentation.enabled:
+                        instrumentation.count('candidates_pruned')
+                    continue
+                if self.place_equipment(point, vector, equipment):
+                    # If the equipment is placed successfully, add it to the placed equipment list
+                    self.add_placed_equipment(equipment)
+                    logger.debug('Equipment %s placed at Point %s, %s', equipment.name, point.x, point.y)
+                    group[0] += 1
+                    remaining_count -= 1
+                    break
+
+        # Return the equipment that is not placed in the order of the equipment list
+        remaining_equipment = [member for group in groups for member in group[1][group[0]:]]
+        return [equipment for index, equipment in sorted(remaining_equipment, key=lambda member: member[0])]
+
+    # Method to run several shuffled layouts and keep the best one
+    def layout_equipment_multi_start(self, trial_count=8, seed=0, processes=None) -> dict:
+        # Each trial shuffles the equipment with its own seed (seed, seed + 1, ...) so the result is reproducible
+        # The trials are independent and run in worker processes, processes=1 runs them in this process
+        # The best layout is applied to this room
+        # No trials are run if the equipment cannot fit, best is then None
+        feasible, self.layout_failure_reason = self.check_feasibility()
+        if not feasible:
+            logger.debug('Layout skipped: %s', self.layout_failure_reason)
+            return {'success': False, 'seed': seed, 'best': None, 'scores': []}
+
+        room_spec = self.to_spec()
+        seeds = [seed + i for i in range(trial_count)]
+        if processes == 1:
+            results = [run_layout_trial(room_spec, trial_seed) for trial_seed in seeds]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+                results = list(executor.map(run_layout_trial, [room_spec] * trial_count, seeds))
+
+        # The first trial wins ties so the same seed always gives the same layout
+        best_result = min(results, key=get_layout_score)
+        self.apply_placements(best_result['placements'])
+
+        scores = []
+        for result in results:
+            scores.append({key: value for key, value in result.items() if key != 'placements'})
+        return {
+            'success': best_result['success'],
+            'seed': best_result['seed'],
+            'best': best_result,
+            'scores': scores,
+        }
+
+    # Method to layout the equipment or reuse a layout of the same room from a LayoutCache
+    def layout_equipment_cached(self, layout_cache: 'LayoutCache', shuffle=False, seed=0, trial_count=1, processes=None) -> dict:
+        # A shuffled layout is only reproducible with a seed, without one the cache is not used
+        # Returns the success flag, the placements and the blocked wall distances, cached is True if the layout was reused
+        use_cache = layout_cache is not None and (seed is not None or not shuffle)
+        if use_cache:
+            key = layout_cache.get_key(self.to_spec(), {'shuffle': shuffle, 'seed': seed, 'trial_count': trial_count})
+            result = layout_cache.get(key)
+            if result is not None:
+                # Only the positions are cached, the geometry is built from them
+                self.apply_placements(result['placements'])
+                return dict(result, cached=True)
+
+        if shuffle and trial_count > 1:
+            success = self.layout_equipment_multi_start(trial_count, seed=seed, processes=processes)['success']
+        else:
+            success = self.layout_equipment(shuffle=shuffle, seed=seed)
+        total_wall_distance, total_blocked_wall_distance = self.calculate_blocked_walls_distance()
+        result = {
+            'success': success,
+            'placed_count': len(self.placed_equipment),
+            'total_wall_distance': total_wall_distance,
+            'total_blocked_wall_distance': total_blocked_wall_distance,
+            'placements': self.get_placements(),
+        }
+        if use_cache:
+            layout_cache.put(key, result)
+        return dict(result, cached=False)
+
+    # Method to layout the equipment with the exact SlotAssignmentSolver
+    # Returns the status of the search, feasible (the layout is applied), infeasible (no layout exists on the candidate points)
+    # or timeout (the layout is left unchanged)
+    def layout_equipment_exact(self, time_limit=10.0) -> dict:
+        feasible, self.layout_failure_reason = self.check_feasibility()
+        if not feasible:
+            return {'success': False, 'status': 'infeasible', 'reason': self.layout_failure_reason}
+        solver = SlotAssignmentSolver(self, time_limit)
+        result = solver.solve()
+        if result['status'] == 'feasible':
+            solver.apply(result['chosen'])
+        logger.debug('Exact layout %s after %d nodes in %.3fs', result['status'], result['node_count'], result['seconds'])
+        return {
+            'success': result['status'] == 'feasible',
+            'status': result['status'],
+            'option_count': result['option_count'],
+            'node_count': result['node_count'],
+            'seconds': result['seconds'],
+        }
+
+    # Method to improve the layout by local search, see LayoutOptimizer
+    # The greedy layout is run first if no equipment is placed, the objective defaults to the blocked wall distance
+    def optimize_layout(self, objective: 'LayoutObjective' = None, iteration_count=1000, seed=0, initial_temperature=1.0, cooling_rate=0.995) -> dict:
+        if not self.placed_equipment:
+            self.layout_equipment(shuffle=True, seed=seed)
+        optimizer = LayoutOptimizer(self, objective, seed, initial_temperature, cooling_rate)
+        return optimizer.run(iteration_count)
+
+    # Method to get the walls of the room, keyed by the name used for the wall faces
+    def get_walls(self) -> dict:
+        # Each wall is (point on the wall, wall vector pointing into the room, start and end along the wall)
+        min_x, min_y, max_x, max_y = self.interior_bounds
+        return {
+            'south': (Point(min_x, min_y), Vector(0, 1), min_x, max_x),
+            'north': (Point(max_x, max_y), Vector(0, -1), min_x, max_x),
+            'west': (Point(min_x, min_y), Vector(1, 0), min_y, max_y),
+            'east': (Point(max_x, max_y), Vector(-1, 0), min_y, max_y),
+        }
+
+    def get_wall_door_intervals(self, wall: tuple) -> list:
+        # Get the merged intervals of a wall taken by door openings, wall is a value of get_walls
+        wall_point, vector, wall_start, wall_end = wall
+        tolerance = 0.001
+        door_intervals = []
+        for door in self.doors:
+            u_min, u_max, v_min, v_max = get_wall_extents(door.void_box, wall_point, vector)
+            if v_min < -tolerance and v_max > -tolerance:
+                door_intervals.append((max(u_min, wall_start), min(u_max, wall_end)))
+        return merge_intervals(door_intervals)
+
+    def get_wall_blocked_intervals(self, boxes: list, wall: tuple) -> list:
+        # Get the intervals of a wall blocked by equipment and clearance boxes, wall is a value of get_walls
+        # Only boxes within 2 feet of the wall that start at the floor block the wall, matching the sampled probes
+        wall_point, vector, wall_start, wall_end = wall
+        offset = 2
+        small_offset = 0.1
+        tolerance = 0.001
+        blocked_intervals = []
+        for box in boxes:
+            if abs(box.min_z) > tolerance:
+                continue
+            u_min, u_max, v_min, v_max = get_wall_extents(box, wall_point, vector)
+            if v_max < small_offset - tolerance or v_min > offset + tolerance:
+                continue
+            if u_max > wall_start and u_min < wall_end:
+                blocked_intervals.append((max(u_min, wall_start), min(u_max, wall_end)))
+        return blocked_intervals
+
+    def calculate_blocked_wall_distances(self) -> dict:
+        # Calculate the exact blocked distance of each wall by merging the intervals blocked by equipment
+        # Returns a dictionary of wall name to (wall distance, blocked wall distance), door openings are left out of both
+        wall_distances = {}
+        for name, wall in self.get_walls().items():
+            wall_point, vector, wall_start, wall_end = wall
+            door_intervals = self.get_wall_door_intervals(wall)
+
+            # Project the equipment and clearance boxes near the wall onto the wall
+            blocked_intervals = []
+            for equipment in self.placed_equipment:
+                blocked_intervals.extend(self.get_wall_blocked_intervals(equipment.boxes, wall))
+
+            wall_distance = wall_end - wall_start - get_intervals_length(door_intervals)
+            blocked_wall_distance = get_intervals_length(blocked_intervals, door_intervals)
+            wall_distances[name] = (wall_distance, blocked_wall_distance)
+
+        return wall_distances
+
+    def calculate_blocked_walls_distance(self, method='exact', probe_lines: list = None) -> tuple:
+        # Calculate the total wall distance and the blocked wall distance
+        # The exact method merges the blocked intervals of each wall, the sampled method counts blocked points every 0.25 feet
+        # The sampled method appends the (start, end) points of each blocked probe to probe_lines when it is given
+        if method == 'exact':
+            wall_distances = self.calculate_blocked_wall_distances().values()
+            total_wall_distance = sum(wall_distance for wall_distance, blocked_wall_distance in wall_distances)
+            total_blocked_wall_distance = sum(blocked_wall_distance for wall_distance, blocked_wall_distance in wall_distances)
+            return total_wall_distance, total_blocked_wall_distance
+        elif method != 'sampled':
+            raise ValueError(f'Unknown blocked wall method: {method}')
+
         # Calculate the total distance of the walls
         total_wall_distance = self.width * 2 + self.length * 2
         for door in self.doors:
             total_wall_distance -= door.width
 
-        # A wall is considered blocked if there is equipment within 3 feet of it
-        # Create a points and vectors around the room
-        points, vectors = self.generate_points_and_vectors(spacing=0.25)
+        # A wall is considered blocked if there is equipment or clearance within 2 feet of it
+        # Each point around the room is a probe running from the wall along its vector
+        # The probes of a wall only differ along the wall, so every box is tested against all probes of a wall at once
+        # The probes through a door are removed from a copy of the candidate set, the cached set is not changed
+        candidate_set = self.get_candidate_set(spacing=0.25).copy()
+
+        # Group the probes by wall, each probe is its position along the wall
+        # The points of each wall are generated in increasing order, so the probes are sorted
+        walls = []
+        for wall_id, (start, end) in enumerate(candidate_set.wall_ranges):
+            if start == end:
+                continue
+            vector = candidate_set.wall_vectors[wall_id]
+            probes = (candidate_set.x if vector.x == 0 else candidate_set.y)[start:end]
+            walls.append((start, candidate_set.get_point(start), vector, probes))
 
-        # Remove points and vectors that overlap with the door void
-        for door in self.doors:
-            door_void = door.void
-            
-            for point, vector in zip(points, vectors):
-                # Offset the point by the vector * -0.25 to get the point inside the wall
-                test_point = point.to_gh_point() + vector.to_gh_vector() * -0.25
-                # Offset the point along the z-axis by 0.5 feet to get the point inside the wall
-                test_point = Rhino.Geometry.Point3d(test_point.X, test_point.Y, test_point.Z + 0.5)
-                intersection_result = door_void.IsPointInside(test_point, 0.001, True)
-                # print(f'intersection_result: {intersection_result}')
-                if intersection_result:
-                    # print(f'Point {point.x}, {point.y} is inside door void')
-                    points.remove(point)
-                    vectors.remove(vector)
-        
-        # Create a list of points that are within 3 feet of the wall
-        blocked_points = []
         offset = 2
         small_offset = 0.1
-        total_offset = offset - small_offset
-        for point, vector in zip(points, vectors):
-            rhino_point = point.to_gh_point()
-            # Offset the point along the vector by 0.1 feet
-            rhino_point += vector.to_gh_vector() * small_offset
-            rhino_vector = vector.to_gh_vector()
-            # Create a line from the point away from the wall
-            line = Rhino.Geometry.Line(rhino_point, rhino_point + rhino_vector * total_offset)
-            
-            # Check if the line intersects with equipment geometry or clearance geometry
+        tolerance = 0.001
+        blocked_count = 0
+        for start, wall_point, vector, probes in walls:
+            blocked = bytearray(len(probes)) # Probes that run into equipment or clearance
+
+            # Remove the probes that overlap with the door void
+            # The probe is tested 0.25 feet inside the wall and 0.5 feet above the floor
+            for door in self.doors:
+                u_min, u_max, v_min, v_max = get_wall_extents(door.void_box, wall_point, vector)
+                if not (v_min < -0.25 < v_max and door.void_box.min_z < 0.5 < door.void_box.max_z):
+                    continue
+                for i in range(bisect.bisect_right(probes, u_min + tolerance), bisect.bisect_left(probes, u_max - tolerance)):
+                    candidate_set.remove(start + i)
+
+            # Find the probes that run into the equipment or clearance geometry
+            # The probes lie on the floor, so only boxes that start at the floor can block them
             for equipment in self.placed_equipment:
-                for geometry in equipment.geometry:
-                    intersection_result = Rhino.Geometry.Intersect.Intersection.CurveBrep(line.ToNurbsCurve(), geometry, 0.001)
-                    # print(f'intersection_result: {intersection_result[1]}')
-                    # output.append(list(intersection_result[1]))
-                    if len(list(intersection_result[1])) > 0:
-                        output.append(line.ToNurbsCurve())
-                        print(f'Point {point.x}, {point.y} is blocked by equipment {equipment.name}')
-                        blocked_points.append(point)
-                        break
+                for box in equipment.boxes:
+                    if abs(box.min_z) > tolerance:
+                        continue
+                    u_min, u_max, v_min, v_max = get_wall_extents(box, wall_point, vector)
+                    if v_max < small_offset - tolerance or v_min > offset + tolerance:
+                        continue
+                    for i in range(bisect.bisect_left(probes, u_min - tolerance), bisect.bisect_right(probes, u_max + tolerance)):
+                        blocked[i] = 1
+
+            for index in candidate_set.get_active_indexes(start, start + len(probes)):
+                if blocked[index - start]:
+                    blocked_count += 1
+                    if probe_lines is not None: # The probe runs from small_offset to offset along the wall vector
+                        x, y = candidate_set.x[index], candidate_set.y[index]
+                        probe_lines.append((Point(x + vector.x * small_offset, y + vector.y * small_offset),
+                                            Point(x + vector.x * offset, y + vector.y * offset)))
+        probe_count = len(candidate_set)
 
         # Calculate the percentage of blocked points compared to the total number of points
-        total_blocked_wall_distance = len(blocked_points) / len(points) * total_wall_distance
+        total_blocked_wall_distance = blocked_count / probe_count * total_wall_distance
 
         return total_wall_distance, total_blocked_wall_distance
 
-# OUTPUTS
-equipment_geometry = []
-clearance_geometry = []
-all_equipment_geometry = []
-room_geometry = []
-
-output = []
-messages = []
-
-# Create an instance of ElectricalRoom
-# INPUTS
-# Dimensions of the room
-room_width = float(room_width)
-room_length = float(room_length)
-room_height = 10
-# door_count = 1
-shuffle = True
-electrical_room = ElectricalRoom(room_width, room_length,
-                                    room_height)
-
-# Create instances of Panelboard and Transformer
-# INPUTS
-panelboard_count = int(panelboard_count)
-transformer_count = int(transformer_count)
-shuffle = bool(shuffle)
-door_point = Point(door_point.X, door_point.Y)
-
-# Add the panelboard and transformer to the electrical room
-
-example_panelboard = Panelboard(name='PBX')
-for i in range(panelboard_count):
-    p = Panelboard(name=f'PB{i+1}', geometry_copy_equipment=example_panelboard)
-    electrical_room.add_equipment(p, 1)
-
-example_transformer = Transformer(name='TX')
-for i in range(transformer_count):
-    t = Transformer(name=f'T{i+1}', geometry_copy_equipment=example_transformer)
-    electrical_room.add_equipment(t, 1)
-
-electrical_room.add_door_from_point(door_point)
-
-# Layout the equipment in the room
-layout_success = electrical_room.layout_equipment(shuffle=shuffle)
-if layout_success:
-    messages.append('Layout successful')
-    messages.append(True)
-else:
-    messages.append('Layout failed')
-    messages.append(False)
-
-# Extract the geometry of the equipment and clearance
-for equipment in electrical_room.placed_equipment:
-    equipment_geometry.append(equipment.equipment_geometry)
-    clearance_geometry.append(equipment.clearance_geometry)
-    all_equipment_geometry.append(equipment.geometry)
-
-room_geometry.append([electrical_room.difference_geometry])
-
-for door in electrical_room.doors:
-    room_geometry.append(door.door_geometry)
-    
-total_wall_distance, total_blocked_wall_distance = electrical_room.calculate_blocked_walls_distance()
-
-print(f'Total wall distance: {total_wall_distance}')
-print(f'Total blocked wall distance: {total_blocked_wall_distance}')
-messages.append(total_wall_distance)
-messages.append(total_blocked_wall_distance)
-
-# Report equipment not placed
-not_placed_counts = {}
-if len(electrical_room.equipment_list) > 0:
-    for equipment in electrical_room.equipment_list:
-        equipment_found = False
-        for placed_equipment in electrical_room.placed_equipment:
-            if equipment.name == placed_equipment.name:
-                print(f'Equipment {equipment.name} is in the placed equipment list')
-                equipment_found = True
-                break # If the equipment is in the placed equipment list, break
-        if not equipment_found:
-            print(f'Equipment {equipment.name} is not in the placed equipment list')
-            # If the equipment is not in the placed equipment list, add it to the not placed counts
-            class_name = equipment.__class__.__name__
-            if class_name in not_placed_counts:
-                not_placed_counts[class_name] += 1
+def create_room_from_spec(spec: dict) -> ElectricalRoom:
+    # Create a room with its doors and equipment from the dictionary returned by ElectricalRoom.to_spec
+    room = ElectricalRoom(spec['width'], spec['length'], spec.get('height', 10), spec.get('interior_rows', False))
+    for door in spec.get('doors', []):
+        room.add_door_from_point(Point(door['x'], door['y']))
+    for equipment_spec in spec['equipment']:
+        room.add_equipment(create_equipment_from_spec(equipment_spec))
+    return room
+
+def run_layout_trial(room_spec: dict, seed: int) -> dict:
+    # Lay out a room from a spec with one shuffled order, this runs in the worker processes of layout_equipment_multi_start
+    room = create_room_from_spec(room_spec)
+    success = room.layout_equipment(shuffle=True, seed=seed)
+    total_wall_distance, total_blocked_wall_distance = room.calculate_blocked_walls_distance()
+    return {
+        'seed': seed,
+        'success': success,
+        'placed_count': len(room.placed_equipment),
+        'total_wall_distance': total_wall_distance,
+        'total_blocked_wall_distance': total_blocked_wall_distance,
+        'placements': room.get_placements(),
+    }
+
+def check_room_feasibility(width, length, equipment_list: list, door_widths: list, interior_rows=False) -> tuple:
+    # Check necessary conditions for a rectangular room to fit all the equipment, without building any geometry
+    # Returns (True, None) if the room may fit the equipment, otherwise (False, reason)
+    # Doors are snapped to points at least half a door width from the corners, so each door needs one wall as long as it is wide
+    # With interior rows the equipment does not need the walls, only the floor area bounds it
+    if door_widths and max(width, length) < max(door_widths):
+        return False, f'The room ({width} x {length}) is too small for a {max(door_widths)} ft door'
+
+    # Each equipment must fit against at least one wall with its clearances
+    for equipment in equipment_list:
+        along_wall = equipment.width + 2 * equipment.side_clearance
+        if equipment.front_clearance > 0:
+            along_wall = max(along_wall, inches_to_feet(30)) # Front clearances are at least 30 inches wide
+        into_room = equipment.rear_clearance + equipment.depth + equipment.front_clearance
+        if not ((along_wall <= width and into_room <= length) or (along_wall <= length and into_room <= width)):
+            return False, f'Equipment {equipment.name} and its clearances ({along_wall:.2f} x {into_room:.2f}) do not fit against any wall'
+
+    if interior_rows:
+        # Equipment never overlaps other equipment, clearances can overlap each other
+        required_area = sum(equipment.width * equipment.depth for equipment in equipment_list)
+        if required_area > width * length:
+            return False, f'The equipment needs {required_area:.2f} sq ft of floor, the room has {width * length:.2f} sq ft'
+        return True, None
+
+    # Each equipment takes at least its width and one side clearance along the walls, side clearances can be shared
+    # Doors take their width, but side clearances can reach into the door clearances on both sides of each door
+    required_wall_length = sum(equipment.width + equipment.side_clearance for equipment in equipment_list)
+    max_side_clearance = max([equipment.side_clearance for equipment in equipment_list], default=0)
+    available_wall_length = 2 * (width + length) - sum(door_widths) + 2 * max_side_clearance * len(door_widths)
+    if required_wall_length > available_wall_length:
+        return False, f'The equipment needs {required_wall_length:.2f} ft of wall, the room has {available_wall_length:.2f} ft without the doors'
+    return True, None
+
+def create_room_spec(width, length, panelboard_count, transformer_count, door_points: list, height=10, interior_rows=False) -> dict:
+    # Create a room spec with the default panelboards and transformers of the Grasshopper script
+    # door_points is a list of (x, y), each door is snapped to the nearest wall when the room is created
+    equipment = [Panelboard(name=f'PB{i+1}').to_spec() for i in range(panelboard_count)]
+    equipment += [Transformer(name=f'T{i+1}').to_spec() for i in range(transformer_count)]
+    spec = {
+        'width': width,
+        'length': length,
+        'height': height,
+        'doors': [{'x': x, 'y': y} for x, y in door_points],
+        'equipment': equipment,
+    }
+    if interior_rows:
+        spec['interior_rows'] = True
+    return spec
+
+def run_layout_request(request: dict, layout_cache: 'LayoutCache' = None) -> dict:
+    # Lay out one room request of the layout service or a batch run
+    # The request holds a room spec under 'spec', or width, length, panelboard_count, transformer_count and doors
+    # Optional layout options are shuffle (True), seed (0), trial_count (1) and interior_rows (False)
+    if 'spec' in request:
+        room_spec = request['spec']
+    else:
+        door_points = [(door['x'], door['y']) for door in request.get('doors', [])]
+        room_spec = create_room_spec(request['width'], request['length'], request.get('panelboard_count', 0),
+                                     request.get('transformer_count', 0), door_points, request.get('height', 10),
+                                     request.get('interior_rows', False))
+    room = create_room_from_spec(room_spec)
+    # The request already runs in a worker process, so the trials run one after the other
+    result = room.layout_equipment_cached(layout_cache, shuffle=request.get('shuffle', True), seed=request.get('seed', 0),
+                                          trial_count=request.get('trial_count', 1), processes=1)
+    result['equipment_count'] = len(room.equipment_list)
+    if 'id' in request:
+        result['id'] = request['id']
+    return result
+
+def get_layout_score(result: dict) -> tuple:
+    # Lower is better, the most placed equipment first and then the least blocked wall distance
+    return (-result['placed_count'], result['total_blocked_wall_distance'])
+
+# Define the LayoutObjective base class
+# Objectives score a layout for LayoutOptimizer, lower scores are better
+# reset computes the score of the room, get_delta returns the change of a move without applying it
+# and commit applies the move last passed to get_delta
+# A move is a dictionary of equipment to (point, vector, equipment boxes, clearance boxes) of its new placement,
+# new equipment is placed and existing equipment is moved
+class LayoutObjective:
+    def reset(self, room: 'ElectricalRoom'):
+        self.room = room
+        self.score = 0
+
+    def get_delta(self, move: dict) -> float:
+        return 0
+
+    def commit(self):
+        pass
+
+# Define the BlockedWallObjective class
+# Minimizes the total blocked wall distance of calculate_blocked_walls_distance
+# The blocked intervals are kept for each equipment and wall, a move only merges the intervals of the walls it touches
+class BlockedWallObjective(LayoutObjective):
+    def reset(self, room: 'ElectricalRoom'):
+        self.room = room
+        self.walls = room.get_walls()
+        self.door_intervals = {name: room.get_wall_door_intervals(wall) for name, wall in self.walls.items()}
+        self.intervals = {} # Dictionary of equipment to a dictionary of wall name to blocked intervals
+        for equipment in room.placed_equipment:
+            self.intervals[equipment] = self.get_equipment_intervals(equipment.boxes)
+        self.wall_scores = {name: self.get_wall_score(name, self.intervals) for name in self.walls}
+        self.score = sum(self.wall_scores.values())
+        self.pending = None
+
+    def get_equipment_intervals(self, boxes: list) -> dict:
+        intervals = {}
+        for name, wall in self.walls.items():
+            wall_intervals = self.room.get_wall_blocked_intervals(boxes, wall)
+            if wall_intervals:
+                intervals[name] = wall_intervals
+        return intervals
+
+    def get_wall_score(self, name, intervals: dict) -> float:
+        blocked_intervals = []
+        for equipment_intervals in intervals.values():
+            blocked_intervals.extend(equipment_intervals.get(name, ()))
+        return get_intervals_length(blocked_intervals, self.door_intervals[name])
+
+    def get_delta(self, move: dict) -> float:
+        intervals = dict(self.intervals)
+        changed_walls = set()
+        for equipment, (point, vector, equipment_boxes, clearance_boxes) in move.items():
+            changed_walls.update(intervals.get(equipment, {}))
+            intervals[equipment] = self.get_equipment_intervals(equipment_boxes + clearance_boxes)
+            changed_walls.update(intervals[equipment])
+        wall_scores = {name: self.get_wall_score(name, intervals) for name in changed_walls}
+        self.pending = (intervals, wall_scores)
+        return sum(wall_scores[name] - self.wall_scores[name] for name in changed_walls)
+
+    def commit(self):
+        intervals, wall_scores = self.pending
+        self.intervals = intervals
+        self.wall_scores.update(wall_scores)
+        self.score = sum(self.wall_scores.values())
+
+# Define the ContiguousFreeWallObjective class
+# Maximizes the longest free stretch of each wall, so the free wall is left in one piece for future equipment
+class ContiguousFreeWallObjective(BlockedWallObjective):
+    def get_wall_score(self, name, intervals: dict) -> float:
+        wall_point, vector, wall_start, wall_end = self.walls[name]
+        taken_intervals = list(self.door_intervals[name])
+        for equipment_intervals in intervals.values():
+            taken_intervals.extend(equipment_intervals.get(name, ()))
+        longest_free = 0
+        position = wall_start
+        for start, end in merge_intervals(taken_intervals):
+            longest_free = max(longest_free, start - position)
+            position = max(position, end)
+        longest_free = max(longest_free, wall_end - position)
+        return -longest_free
+
+# Define the ProximityObjective class
+# Minimizes the distance from each equipment of one type to the nearest equipment of another type,
+# by default transformers to panelboards
+# The nearest target of each equipment is kept, a move only recomputes the moved equipment and the equipment
+# whose nearest target moved, every other equipment only checks its distance to the moved targets
+class ProximityObjective(LayoutObjective):
+    def __init__(self, equipment_type='Transformer', target_type='Panelboard'):
+        self.equipment_type = equipment_type
+        self.target_type = target_type
+
+    def reset(self, room: 'ElectricalRoom'):
+        self.room = room
+        self.positions = {equipment: equipment.position for equipment in room.placed_equipment}
+        self.targets = set(equipment for equipment in self.positions if equipment.__class__.__name__ == self.target_type)
+        self.nearest = {} # Dictionary of equipment to (distance, nearest target or None)
+        for equipment, position in self.positions.items():
+            if equipment.__class__.__name__ == self.equipment_type:
+                self.nearest[equipment] = self.get_nearest(position, self.targets, self.positions)
+        self.score = sum(distance for distance, target in self.nearest.values())
+        self.pending = None
+
+    def get_nearest(self, position: Point, targets, positions) -> tuple: # Get (distance, target) of the nearest target, (0, None) without targets
+        nearest = (0, None)
+        for target in targets:
+            distance = position.distance(positions[target])
+            if nearest[1] is None or distance < nearest[0]:
+                nearest = (distance, target)
+        return nearest
+
+    def get_delta(self, move: dict) -> float:
+        moved_types = set(equipment.__class__.__name__ for equipment in move)
+        if not moved_types & {self.equipment_type, self.target_type}:
+            self.pending = None
+            return 0
+
+        # Positions after the move, the moved positions are looked up before the current ones
+        moved_positions = {equipment: point for equipment, (point, vector, equipment_boxes, clearance_boxes) in move.items()}
+        positions = collections.ChainMap(moved_positions, self.positions)
+        moved_targets = [equipment for equipment in move if equipment.__class__.__name__ == self.target_type]
+        recomputed = set(equipment for equipment in move if equipment.__class__.__name__ == self.equipment_type)
+
+        changes = {}
+        if moved_targets:
+            for equipment, (distance, target) in self.nearest.items():
+                if equipment in recomputed:
+                    continue
+                if target in moved_positions: # The nearest target moved away, another target may be nearest now
+                    recomputed.add(equipment)
+                    continue
+                position = self.positions[equipment]
+                nearest = (distance, target)
+                for moved_target in moved_targets:
+                    moved_distance = position.distance(moved_positions[moved_target])
+                    if nearest[1] is None or moved_distance < nearest[0]:
+                        nearest = (moved_distance, moved_target)
+                if nearest[1] is not target:
+                    changes[equipment] = nearest
+
+        if recomputed:
+            targets = self.targets.union(moved_targets)
+            for equipment in recomputed:
+                changes[equipment] = self.get_nearest(positions[equipment], targets, positions)
+
+        delta = sum(nearest[0] - self.nearest.get(equipment, (0, None))[0] for equipment, nearest in changes.items())
+        self.pending = (moved_positions, moved_targets, changes, delta)
+        return delta
+
+    def commit(self):
+        if self.pending is not None:
+            moved_positions, moved_targets, changes, delta = self.pending
+            self.positions.update(moved_positions)
+            self.targets.update(moved_targets)
+            self.nearest.update(changes)
+            self.score += delta
+
+# Define the WeightedObjective class
+# Combines several objectives, each scaled by its weight
+class WeightedObjective(LayoutObjective):
+    def __init__(self, weighted_objectives: list):
+        self.weighted_objectives = weighted_objectives # List of (objective, weight)
+
+    def reset(self, room: 'ElectricalRoom'):
+        self.room = room
+        for objective, weight in self.weighted_objectives:
+            objective.reset(room)
+        self.score = sum(objective.score * weight for objective, weight in self.weighted_objectives)
+
+    def get_delta(self, move: dict) -> float:
+        return sum(objective.get_delta(move) * weight for objective, weight in self.weighted_objectives)
+
+    def commit(self):
+        for objective, weight in self.weighted_objectives:
+            objective.commit()
+        self.score = sum(objective.score * weight for objective, weight in self.weighted_objectives)
+
+# Define the LayoutOptimizer class
+# Improves a layout by simulated annealing over move, rotate, swap and insert moves
+# move takes equipment to another point of the same wall, rotate to a point of another wall,
+# swap exchanges two equipment with different footprints and insert places equipment that is not placed yet
+# Each move is checked against the spatial indexes with only the moved equipment taken out,
+# and scored with the change of the objective, so nothing is recomputed for the whole room
+class LayoutOptimizer:
+    move_kinds = ('move', 'rotate', 'swap')
+
+    def __init__(self, room: 'ElectricalRoom', objective: LayoutObjective = None, seed=0, initial_temperature=1.0, cooling_rate=0.995):
+        self.room = room
+        self.objective = objective if objective is not None else BlockedWallObjective()
+        self.random = random.Random(seed)
+        self.initial_temperature = initial_temperature
+        self.cooling_rate = cooling_rate
+
+        # Candidate points grouped by wall vector
+        self.candidates = list(room.get_candidate_set())
+        self.wall_candidates = {}
+        for point, vector in self.candidates:
+            self.wall_candidates.setdefault((vector.x, vector.y), []).append((point, vector))
+
+    def fits(self, equipment_boxes: list, clearance_boxes: list) -> bool:
+        # The same checks as place_equipment, the moved equipment must already be taken out of the indexes
+        room = self.room
+        return (room.contains_boxes(equipment_boxes + clearance_boxes)
+                and not room.equipment_index.intersects(equipment_boxes + clearance_boxes)
+                and not room.clearance_index.intersects(equipment_boxes))
+
+    def remove_from_indexes(self, equipment: 'ElectricalEquipment'):
+        self.room.equipment_index.remove(equipment.equipment_boxes, equipment)
+        self.room.clearance_index.remove(equipment.clearance_boxes, equipment)
+
+    def insert_into_indexes(self, equipment: 'ElectricalEquipment'):
+        for box in equipment.equipment_boxes:
+            self.room.equipment_index.insert(box, equipment)
+        for box in equipment.clearance_boxes:
+            self.room.clearance_index.insert(box, equipment)
+
+    def get_candidate(self, kind, vector: Vector) -> tuple: # Get a random point on the same wall (move) or another wall (rotate)
+        if kind == 'move':
+            return self.random.choice(self.wall_candidates[(vector.x, vector.y)])
+        other_walls = [key for key in self.wall_candidates if key != (vector.x, vector.y)]
+        return self.random.choice(self.wall_candidates[self.random.choice(other_walls)])
+
+    def propose(self, kind):
+        # Get a legal move of the given kind, None if the random move collides
+        # The moved equipment is taken out of the indexes, the caller puts it back
+        room = self.room
+        if kind == 'insert':
+            equipment = self.random.choice(self.unplaced_equipment)
+            point, vector = self.random.choice(self.candidates)
+            equipment_boxes, clearance_boxes = equipment.get_footprint_template(vector).get_boxes(point)
+            if not self.fits(equipment_boxes, clearance_boxes):
+                return None
+            return {equipment: (point, vector, equipment_boxes, clearance_boxes)}
+
+        if kind == 'swap':
+            equipment, other_equipment = self.random.sample(room.placed_equipment, 2)
+            if equipment.get_footprint_template() is other_equipment.get_footprint_template(equipment.orientation):
+                return None # Swapping equipment with the same footprint changes nothing
+            equipment_boxes, clearance_boxes = equipment.get_footprint_template(other_equipment.orientation).get_boxes(other_equipment.position)
+            other_equipment_boxes, other_clearance_boxes = other_equipment.get_footprint_template(equipment.orientation).get_boxes(equipment.position)
+            move = {equipment: (other_equipment.position, other_equipment.orientation, equipment_boxes, clearance_boxes),
+                    other_equipment: (equipment.position, equipment.orientation, other_equipment_boxes, other_clearance_boxes)}
+        else:
+            equipment = self.random.choice(room.placed_equipment)
+            point, vector = self.get_candidate(kind, equipment.orientation)
+            equipment_boxes, clearance_boxes = equipment.get_footprint_template(vector).get_boxes(point)
+            move = {equipment: (point, vector, equipment_boxes, clearance_boxes)}
+
+        for moved_equipment in move:
+            self.remove_from_indexes(moved_equipment)
+        for point, vector, equipment_boxes, clearance_boxes in move.values():
+            if not self.fits(equipment_boxes, clearance_boxes):
+                self.restore(move)
+                return None
+        if kind == 'swap':
+            # The swapped equipment must not collide with each other either
+            if (boxes_intersect(equipment_boxes, other_equipment_boxes + other_clearance_boxes)
+                    or boxes_intersect(other_equipment_boxes, clearance_boxes)):
+                self.restore(move)
+                return None
+        return move
+
+    def restore(self, move: dict): # Put the equipment of a rejected move back into the indexes
+        for equipment in move:
+            if equipment not in self.unplaced_indexes:
+                self.insert_into_indexes(equipment)
+
+    def set_placed(self, equipment: 'ElectricalEquipment'): # Take inserted equipment out of the unplaced equipment
+        # The last unplaced equipment takes the place of the inserted one, so the list never shifts
+        index = self.unplaced_indexes.pop(equipment)
+        last_equipment = self.unplaced_equipment.pop()
+        if last_equipment is not equipment:
+            self.unplaced_equipment[index] = last_equipment
+            self.unplaced_indexes[last_equipment] = index
+
+    def apply(self, move: dict):
+        for equipment, (point, vector, equipment_boxes, clearance_boxes) in move.items():
+            if equipment in self.unplaced_indexes:
+                self.room.placed_equipment.append(equipment)
+                self.set_placed(equipment)
+            equipment.set_position(point)
+            equipment.orient(vector)
+            self.insert_into_indexes(equipment)
+        self.objective.commit()
+
+    def run(self, iteration_count=1000) -> dict:
+        room = self.room
+        objective = self.objective
+        objective.reset(room)
+        initial_score = objective.score
+        # Unplaced equipment for insert moves, with the index of each equipment in the list
+        # Equipment added to the room more than once is only listed once
+        self.unplaced_equipment = list(dict.fromkeys(room.get_unplaced_equipment()))
+        self.unplaced_indexes = {equipment: index for index, equipment in enumerate(self.unplaced_equipment)}
+        best = (-len(room.placed_equipment), objective.score)
+        best_placements = room.get_placements()
+        accepted_count = 0
+
+        temperature = self.initial_temperature
+        for iteration in range(iteration_count):
+            # Placing more equipment always comes first
+            if self.unplaced_equipment and self.random.random() < 0.5:
+                kind = 'insert'
+            elif len(room.placed_equipment) >= 2:
+                kind = self.random.choice(self.move_kinds)
+            elif room.placed_equipment:
+                kind = self.random.choice(('move', 'rotate'))
             else:
-                not_placed_counts[class_name] = 1
+                continue
+
+            move = self.propose(kind)
+            if move is not None:
+                delta = objective.get_delta(move)
+                if kind == 'insert' or delta <= 0 or (temperature > 0 and self.random.random() < math.exp(-delta / temperature)):
+                    self.apply(move)
+                    accepted_count += 1
+                    score = (-len(room.placed_equipment), objective.score)
+                    if score < (best[0], best[1] - 1e-9):
+                        best = score
+                        best_placements = room.get_placements()
+                else:
+                    self.restore(move)
+            temperature *= self.cooling_rate
+
+        # Go back to the best layout, this also rebuilds the candidate pruner that cannot follow the moves
+        if (-len(room.placed_equipment), objective.score) != best:
+            room.apply_placements(best_placements)
+        else:
+            room.candidate_pruner = room.create_candidate_pruner()
+        logger.debug('Optimized layout score %s to %s, %d moves accepted', initial_score, best[1], accepted_count)
+        return {
+            'success': len(room.get_unplaced_equipment()) == 0,
+            'placed_count': len(room.placed_equipment),
+            'initial_score': initial_score,
+            'score': best[1],
+            'accepted_count': accepted_count,
+            'iteration_count': iteration_count,
+        }
+
+def get_bit_count(mask: int) -> int: # Count the set bits of a bitset
+    return bin(mask).count('1')
+
+# Define the SlotAssignmentSolver class
+# Exact layout over the candidate points of generate_points_and_vectors
+# Equipment with the same footprint is interchangeable, so the model chooses a number of slots (point and wall vector)
+# for each footprint where no two chosen slots collide
+# The collisions of every pair of slots are precomputed as a conflict graph stored in integer bitsets,
+# the branch and bound then places the footprint with the fewest spare slots first and prunes as soon as
+# a footprint has fewer free slots left than equipment to place
+# The search is complete for the candidate points, it either finds a layout or proves there is none, within the time limit
+class SlotAssignmentSolver:
+    def __init__(self, room: 'ElectricalRoom', time_limit=10.0):
+        self.room = room
+        self.time_limit = time_limit
+        self.node_count = 0
+
+        # Group the equipment by footprint, the key is the template in the default orientation
+        self.groups = [] # List of equipment lists
+        group_indexes = {}
+        for equipment in room.equipment_list:
+            template = equipment.get_footprint_template(Vector(0, 1))
+            if template not in group_indexes:
+                group_indexes[template] = len(self.groups)
+                self.groups.append([])
+            self.groups[group_indexes[template]].append(equipment)
+
+        self.options = [] # List of (group index, point, vector, equipment boxes, clearance boxes)
+        self.group_masks = [0] * len(self.groups) # Bitset of the options of each group
+        self.conflicts = [] # Bitset of the options colliding with each option, including the option itself
+        self.create_options()
+        self.create_conflicts()
+
+        # Options in a clique all collide with each other, so at most one of them is chosen
+        # The number of cliques with a free option bounds the equipment that can still be placed,
+        # for each footprint and for all the equipment together
+        self.group_cliques = [self.create_cliques(sorted(self.get_option_indexes(group_mask))) for group_mask in self.group_masks]
+        self.cliques = self.create_cliques(sorted(range(len(self.options)), key=lambda index: self.option_slots[index]))
+
+    def create_options(self):
+        # Keep the slots where each footprint fits the room and stays out of the door clearances
+        # Only the doors are checked, the clearance index also holds the clearances of any equipment already placed
+        room = self.room
+        candidates = list(room.get_candidate_set())
+        door_clearance_boxes = [box for door in room.doors for box in door.clearance_boxes]
+        self.option_slots = [] # Index of the candidate point of each option, used to order the options along the walls
+        for group_index, group in enumerate(self.groups):
+            for slot_index, (point, vector) in enumerate(candidates):
+                equipment_boxes, clearance_boxes = group[0].get_footprint_template(vector).get_boxes(point)
+                if not room.contains_boxes(equipment_boxes + clearance_boxes):
+                    continue
+                if boxes_intersect(equipment_boxes, door_clearance_boxes):
+                    continue
+                self.group_masks[group_index] |= 1 << len(self.options)
+                self.options.append((group_index, point, vector, equipment_boxes, clearance_boxes))
+                self.option_slots.append(slot_index)
+
+    def create_conflicts(self):
+        # Only options sharing a grid cell can collide
+        grid = SpatialGrid()
+        for index, (group_index, point, vector, equipment_boxes, clearance_boxes) in enumerate(self.options):
+            for box in equipment_boxes + clearance_boxes:
+                grid.insert(box, index)
+
+        for index, (group_index, point, vector, equipment_boxes, clearance_boxes) in enumerate(self.options):
+            conflict = 1 << index
+            nearby_indexes = set()
+            for box in equipment_boxes + clearance_boxes:
+                nearby_indexes.update(grid.query_items(box))
+            for other_index in nearby_indexes:
+                other_equipment_boxes, other_clearance_boxes = self.options[other_index][3], self.options[other_index][4]
+                # The same rules as place_equipment, clearances may overlap each other
+                if (boxes_intersect(equipment_boxes, other_equipment_boxes + other_clearance_boxes)
+                        or boxes_intersect(clearance_boxes, other_equipment_boxes)):
+                    conflict |= 1 << other_index
+            self.conflicts.append(conflict)
+
+    def get_option_indexes(self, mask: int) -> list: # Get the indexes of the options in a bitset
+        indexes = []
+        while mask:
+            bit = mask & -mask
+            indexes.append(bit.bit_length() - 1)
+            mask ^= bit
+        return indexes
+
+    def create_cliques(self, indexes: list) -> list:
+        # Partition options into cliques greedily, neighbouring options along a wall usually collide with each other
+        cliques = []
+        for index in indexes:
+            for clique_index, clique in enumerate(cliques):
+                # The clique bitset is added to the conflicts of the option, all its options must collide with it
+                if clique & ~self.conflicts[index] == 0:
+                    cliques[clique_index] = clique | (1 << index)
+                    break
+            else:
+                cliques.append(1 << index)
+        return cliques
+
+    def get_clique_bound(self, available: int, cliques: list) -> int: # Count the cliques with a free option
+        count = 0
+        for clique in cliques:
+            if available & clique:
+                count += 1
+        return count
+
+    def search(self, available: int, remaining: list, chosen: list) -> bool:
+        self.node_count += 1
+        if self.node_count % 1000 == 0 and time.perf_counter() > self.deadline:
+            raise TimeoutError
+
+        # Branch on the footprint with the fewest spare slots, stop if any footprint cannot be completed
+        branch_group = None
+        branch_slack = None
+        for group_index, count in enumerate(remaining):
+            if count == 0:
+                continue
+            slot_count = get_bit_count(available & self.group_masks[group_index])
+            if slot_count < count:
+                return False
+            if branch_slack is None or slot_count - count < branch_slack:
+                branch_group, branch_slack = group_index, slot_count - count
+        if branch_group is None:
+            return True
+
+        # Stronger bounds, each clique holds at most one equipment
+        for group_index, count in enumerate(remaining):
+            if count > 0 and self.get_clique_bound(available, self.group_cliques[group_index]) < count:
+                return False
+        if self.get_clique_bound(available, self.cliques) < sum(remaining):
+            return False
 
-not_placed_messages = []
-for key, value in not_placed_counts.items():
-    if value > 1:
-        not_placed_messages.append(f'{value} {key}s not placed')
+        # The equipment of a footprint is interchangeable, so its slots are chosen in increasing order:
+        # choosing a slot excludes the lower slots of the same footprint that were skipped
+        candidates = available & self.group_masks[branch_group]
+        remaining[branch_group] -= 1
+        while get_bit_count(candidates) > remaining[branch_group]:
+            bit = candidates & -candidates
+            index = bit.bit_length() - 1
+            candidates ^= bit
+            lower_options = self.group_masks[branch_group] & ((bit << 1) - 1)
+            chosen.append(index)
+            if self.search(available & ~self.conflicts[index] & ~lower_options, remaining, chosen):
+                return True
+            chosen.pop()
+        remaining[branch_group] += 1
+        return False
+
+    def solve(self) -> dict:
+        # Returns the status (feasible, infeasible or timeout), the chosen options and the search statistics
+        start_time = time.perf_counter()
+        self.deadline = start_time + self.time_limit
+        self.node_count = 0
+        chosen = []
+        try:
+            feasible = self.search((1 << len(self.options)) - 1, [len(group) for group in self.groups], chosen)
+            status = 'feasible' if feasible else 'infeasible'
+        except TimeoutError:
+            status = 'timeout'
+            chosen = []
+        return {
+            'status': status,
+            'chosen': chosen,
+            'option_count': len(self.options),
+            'node_count': self.node_count,
+            'seconds': time.perf_counter() - start_time,
+        }
+
+    def apply(self, chosen: list):
+        # Place the equipment of each footprint on its chosen slots
+        room = self.room
+        room.clear_layout()
+        next_equipment = [0] * len(self.groups)
+        for index in chosen:
+            group_index, point, vector, equipment_boxes, clearance_boxes = self.options[index]
+            equipment = self.groups[group_index][next_equipment[group_index]]
+            next_equipment[group_index] += 1
+            equipment.set_position(point)
+            equipment.orient(vector)
+            room.add_placed_equipment(equipment)
+
+# Define the RoomSizeSolver class
+# Finds the smallest room (by area) where layout_equipment places all the equipment
+# For each width on a grid of step feet, the smallest feasible length is found by bisection,
+# the lengths are limited by the aspect ratio and by the best area found so far
+# A room bigger in both directions than a feasible room is taken as feasible and a room smaller in both directions
+# than an infeasible room as infeasible, so layouts are only run for sizes that are not decided by earlier results
+class RoomSizeSolver:
+    def __init__(self, equipment_specs: list, door_walls=('south',), max_aspect_ratio=2.0, step=0.5, height=10,
+                 shuffle=True, seed=0, trial_count=1, interior_rows=False):
+        self.equipment_specs = equipment_specs # Equipment as dictionaries returned by ElectricalEquipment.to_spec
+        self.door_walls = door_walls # A door is placed in the middle of each of these walls
+        self.max_aspect_ratio = max_aspect_ratio
+        self.step = step
+        self.height = height
+        self.shuffle = shuffle
+        self.seed = seed
+        self.trial_count = trial_count
+        self.interior_rows = interior_rows # Also place equipment on rows inside the room
+
+        self.feasible_sizes = [] # Sizes (width, length) where all equipment was placed
+        self.infeasible_sizes = [] # Sizes (width, length) where the layout failed
+        self.layout_count = 0 # Layouts run
+        self.bound_rejected_count = 0 # Sizes rejected by the lower bound without a layout
+        self.best_result = None
+
+        # Equipment and door widths used by the feasibility check, created once for all sizes
+        self.equipment_list = [create_equipment_from_spec(spec) for spec in equipment_specs]
+        self.door_widths = [Door().width for wall in door_walls]
+
+    def get_room_spec(self, width, length) -> dict:
+        door_points = {'south': (0, -length / 2), 'north': (0, length / 2), 'east': (width / 2, 0), 'west': (-width / 2, 0)}
+        spec = {
+            'width': width,
+            'length': length,
+            'height': self.height,
+            'doors': [{'x': door_points[wall][0], 'y': door_points[wall][1]} for wall in self.door_walls],
+            'equipment': self.equipment_specs,
+        }
+        if self.interior_rows:
+            spec['interior_rows'] = True
+        return spec
+
+    def passes_lower_bound(self, width, length) -> bool:
+        # Cheap necessary conditions, a room failing them can never fit all the equipment
+        feasible, reason = check_room_feasibility(width, length, self.equipment_list, self.door_widths, self.interior_rows)
+        return feasible
+
+    def is_feasible(self, width, length) -> bool:
+        # Check if all equipment is placed in a room, using earlier results where they decide the size
+        if not self.passes_lower_bound(width, length):
+            self.bound_rejected_count += 1
+            return False
+        for feasible_width, feasible_length in self.feasible_sizes:
+            if width >= feasible_width and length >= feasible_length:
+                return True
+        for infeasible_width, infeasible_length in self.infeasible_sizes:
+            if width <= infeasible_width and length <= infeasible_length:
+                return False
+
+        room = create_room_from_spec(self.get_room_spec(width, length))
+        result = room.layout_equipment_cached(None, shuffle=self.shuffle, seed=self.seed, trial_count=self.trial_count, processes=1)
+        self.layout_count += 1
+        logger.debug('Room %s x %s: %d of %d placed', width, length, result['placed_count'], len(self.equipment_specs))
+        if result['success']:
+            self.feasible_sizes.append((width, length))
+            if self.best_result is None or width * length < self.best_result['width'] * self.best_result['length']:
+                self.best_result = dict(result, width=width, length=length)
+        else:
+            self.infeasible_sizes.append((width, length))
+        return result['success']
+
+    def solve(self, max_size=200) -> dict:
+        # Returns the smallest width and length found with its layout result, success is False if no room up to max_size fits
+        step = self.step
+        max_steps = int(max_size / step)
+
+        # Find a feasible square room by doubling, its area limits the search
+        square_steps = 1
+        while not self.is_feasible(square_steps * step, square_steps * step):
+            if square_steps >= max_steps:
+                return self.get_solution(False)
+            square_steps = min(square_steps * 2, max_steps)
+        best_area = (square_steps * step) ** 2
+
+        # A width can only beat the best area if the shortest length allowed by the aspect ratio fits in it
+        width_steps = 1
+        while (width_steps * step) ** 2 / self.max_aspect_ratio < best_area and width_steps <= max_steps:
+            width = width_steps * step
+            min_length_steps = max(1, math.ceil(width / self.max_aspect_ratio / step - 1e-9))
+            max_length_steps = min(max_steps, int(width * self.max_aspect_ratio / step + 1e-9), int(best_area / width / step + 1e-9))
+            width_steps += 1
+            if min_length_steps > max_length_steps or not self.is_feasible(width, max_length_steps * step):
+                continue
+
+            # Bisect for the shortest feasible length, assuming longer rooms stay feasible
+            low_steps, high_steps = min_length_steps, max_length_steps
+            while low_steps < high_steps:
+                middle_steps = (low_steps + high_steps) // 2
+                if self.is_feasible(width, middle_steps * step):
+                    high_steps = middle_steps
+                else:
+                    low_steps = middle_steps + 1
+            best_area = min(best_area, width * high_steps * step)
+
+        return self.get_solution(True)
+
+    def get_solution(self, success) -> dict:
+        solution = {
+            'success': success and self.best_result is not None,
+            'layout_count': self.layout_count,
+            'bound_rejected_count': self.bound_rejected_count,
+        }
+        if solution['success']:
+            solution['width'] = self.best_result['width']
+            solution['length'] = self.best_result['length']
+            solution['area'] = self.best_result['width'] * self.best_result['length']
+            solution['result'] = self.best_result
+        return solution
+
+# Define the LayoutCache class
+# Layout results are stored as one JSON file per room in a directory, so they persist between sessions
+# and can be shared by several processes, the least recently used files are removed above max_entries
+class LayoutCache:
+    def __init__(self, directory, max_entries=1000):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def get_canonical_value(self, value): # Numbers are compared as floats, so a width of 12 and 12.0 give the same key
+        if isinstance(value, bool) or value is None or isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)):
+            return round(float(value), 6)
+        if isinstance(value, dict):
+            return {str(key): self.get_canonical_value(item) for key, item in value.items()}
+        return [self.get_canonical_value(item) for item in value]
+
+    def get_key(self, room_spec: dict, layout_options: dict) -> str: # Get the hash of a room spec and the layout options
+        canonical = self.get_canonical_value({'room': room_spec, 'options': layout_options})
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key: str): # Get a cached result, None if the key is not cached
+        path = self.get_path(key)
+        try:
+            with open(path) as cache_file:
+                result = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        # The modification time records the last use for the eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key: str, result: dict):
+        # Write to a temporary file first so other processes never read a partial result
+        path = self.get_path(key)
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'w') as cache_file:
+            json.dump(result, cache_file)
+        os.replace(temporary_path, path)
+        self.evict()
+
+    def evict(self): # Remove the least recently used results above max_entries
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith('.json'):
+                path = os.path.join(self.directory, file_name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for modified_time, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+# Run the layout when the script runs in the Grasshopper component
+# The inputs are only defined there, this also lets worker processes import the classes above
+if 'ghenv' in globals():
+    # Import grasshopper treehelper
+    import ghpythonlib.treehelpers as th
+    import scriptcontext
+
+    # OUTPUTS
+    equipment_geometry = []
+    clearance_geometry = []
+    all_equipment_geometry = []
+    room_geometry = []
+
+    output = []
+    messages = []
+
+    # INPUTS
+    # Dimensions of the room
+    room_width = float(room_width)
+    room_length = float(room_length)
+    room_height = 10
+    # door_count = 1
+    shuffle = True
+    panelboard_count = int(panelboard_count)
+    transformer_count = int(transformer_count)
+    shuffle = bool(shuffle)
+    door_point = Point(door_point.X, door_point.Y)
+
+    # debug is an optional input, it logs the layout progress and prints the counters and timers of the layout
+    debug = 'debug' in globals() and bool(debug)
+    if debug:
+        logging.basicConfig(level=logging.DEBUG, format='%(message)s')
+
+    # trial_count is an optional input, the number of shuffled layouts to try, the best one is kept
+    trial_count = int(trial_count) if 'trial_count' in globals() and trial_count else 1
+
+    # interior_rows is an optional input, equipment that does not fit along the walls is then placed on rows inside the room
+    interior_rows = 'interior_rows' in globals() and bool(interior_rows)
+
+    # cache_directory is an optional input, layouts are then seeded and reused from a LayoutCache in that directory
+    cache_directory = cache_directory if 'cache_directory' in globals() and cache_directory else None
+
+    # exact_time_limit is an optional input, the seconds the exact slot assignment may search when the greedy layout fails
+    exact_time_limit = float(exact_time_limit) if 'exact_time_limit' in globals() and exact_time_limit else 0
+
+    # optimize_iterations is an optional input, the number of local search moves tried to reduce the blocked wall distance
+    optimize_iterations = int(optimize_iterations) if 'optimize_iterations' in globals() and optimize_iterations else 0
+
+    # incremental is an optional input, the room of the previous run is kept in scriptcontext.sticky
+    # and only changes to the counts and the door point are applied to its layout
+    # Changing any other input that affects the layout still lays out the room from scratch
+    incremental = 'incremental' in globals() and bool(incremental)
+    sticky_key = f'electrical_room_layout_{ghenv.Component.InstanceGuid}' if incremental else None
+    layout_state = scriptcontext.sticky.get(sticky_key) if incremental else None
+    room_key = (room_width, room_length, room_height, shuffle, trial_count, interior_rows, cache_directory,
+                exact_time_limit, optimize_iterations)
+
+    if layout_state is not None and layout_state['room_key'] != room_key:
+        layout_state = None
+
+    if layout_state is not None:
+        electrical_room = layout_state['room']
+        electrical_room.instrumentation.enabled = debug
+
+        # Add or remove panelboards and transformers, new equipment is placed around the existing layout
+        for equipment_class, name_prefix, equipment_count in ((Panelboard, 'PB', panelboard_count), (Transformer, 'T', transformer_count)):
+            equipment_items = layout_state['equipment'][name_prefix]
+            while len(equipment_items) > equipment_count:
+                electrical_room.remove_equipment(equipment_items.pop())
+            while len(equipment_items) < equipment_count:
+                equipment = equipment_class(name=f'{name_prefix}{len(equipment_items)+1}', geometry_copy_equipment=layout_state['examples'][name_prefix])
+                equipment_items.append(equipment)
+                electrical_room.add_and_place_equipment(equipment)
+
+        # Move the door, only the equipment in the new door clearance is placed again
+        # The room is laid out again from scratch if it had no door, since no wall fitted it when the room was created,
+        # or if the equipment in the new door clearance does not fit elsewhere
+        if (door_point.x, door_point.y) != layout_state['door_point']:
+            if electrical_room.doors and electrical_room.move_door(electrical_room.doors[0], door_point):
+                layout_state['door_point'] = (door_point.x, door_point.y)
+            else:
+                layout_state = None
+
+    if layout_state is not None:
+        layout_success = len(electrical_room.get_unplaced_equipment()) == 0
+    else:
+        # Create an instance of ElectricalRoom
+        electrical_room = ElectricalRoom(room_width, room_length,
+                                            room_height, interior_rows)
+
+        # Add the panelboard and transformer to the electrical room
+        example_panelboard = Panelboard(name='PBX')
+        panelboards = []
+        for i in range(panelboard_count):
+            p = Panelboard(name=f'PB{i+1}', geometry_copy_equipment=example_panelboard)
+            panelboards.append(p)
+            electrical_room.add_equipment(p, 1)
+
+        example_transformer = Transformer(name='TX')
+        transformers = []
+        for i in range(transformer_count):
+            t = Transformer(name=f'T{i+1}', geometry_copy_equipment=example_transformer)
+            transformers.append(t)
+            electrical_room.add_equipment(t, 1)
+
+        electrical_room.add_door_from_point(door_point)
+        electrical_room.instrumentation.enabled = debug
+
+        # Layout the equipment in the room
+        # Worker processes cannot be started from inside Rhino, so the trials run one after the other
+        if cache_directory is not None:
+            layout_result = electrical_room.layout_equipment_cached(LayoutCache(cache_directory), shuffle=shuffle, seed=0, trial_count=trial_count, processes=1)
+            layout_success = layout_result['success']
+            if layout_result['cached']:
+                print('Layout loaded from cache')
+        elif shuffle and trial_count > 1:
+            layout_success = electrical_room.layout_equipment_multi_start(trial_count, seed=0, processes=1)['success']
+        else:
+            layout_success = electrical_room.layout_equipment(shuffle=shuffle)
+
+        # If the exact slot assignment proves there is no layout or runs out of time, the greedy layout is kept
+        if not layout_success and exact_time_limit > 0:
+            greedy_placements = electrical_room.get_placements()
+            exact_result = electrical_room.layout_equipment_exact(exact_time_limit)
+            print(f'Exact layout: {exact_result["status"]}')
+            if exact_result['success']:
+                layout_success = True
+            else:
+                electrical_room.apply_placements(greedy_placements)
+
+        # Reduce the blocked wall distance by local search
+        if optimize_iterations > 0:
+            layout_success = electrical_room.optimize_layout(iteration_count=optimize_iterations)['success']
+
+        if incremental:
+            scriptcontext.sticky[sticky_key] = {
+                'room_key': room_key,
+                'room': electrical_room,
+                'equipment': {'PB': panelboards, 'T': transformers},
+                'examples': {'PB': example_panelboard, 'T': example_transformer},
+                'door_point': (door_point.x, door_point.y),
+            }
+
+    if layout_success:
+        messages.append('Layout successful')
+        messages.append(True)
+    else:
+        messages.append('Layout failed')
+        messages.append(False)
+
+    if debug:
+        print(electrical_room.instrumentation.get_summary())
+
+    # The placement results are the primary output, one per placed equipment with its name, type, position and orientation
+    output = electrical_room.get_placement_results()
+
+    # build_geometry is an optional input, set it to False to skip the Breps when only the placements and metrics are needed
+    # geometry_threads is an optional input, the number of threads that build the equipment Breps
+    build_geometry = bool(build_geometry) if 'build_geometry' in globals() and build_geometry is not None else True
+    geometry_threads = int(geometry_threads) if 'geometry_threads' in globals() and geometry_threads else 1
+    if build_geometry:
+        # Extract the geometry of the equipment and clearance
+        for placement_result in materialize_geometry(output, geometry_threads):
+            equipment_geometry.append(placement_result.equipment_geometry)
+            clearance_geometry.append(placement_result.clearance_geometry)
+            all_equipment_geometry.append(placement_result.geometry)
+
+        room_geometry.append([electrical_room.difference_geometry])
+
+        for door in electrical_room.doors:
+            room_geometry.append(door.door_geometry)
+
+        # The last branch of room_geometry holds the probes of the sampled blocked wall method that run into equipment or clearance
+        probe_lines = []
+        electrical_room.calculate_blocked_walls_distance(method='sampled', probe_lines=probe_lines)
+        room_geometry.append([geometry_backend.create_line(start, end) for start, end in probe_lines])
+        
+    total_wall_distance, total_blocked_wall_distance = electrical_room.calculate_blocked_walls_distance()
+
+    print(f'Total wall distance: {total_wall_distance}')
+    print(f'Total blocked wall distance: {total_blocked_wall_distance}')
+    for wall_name, (wall_distance, blocked_wall_distance) in electrical_room.calculate_blocked_wall_distances().items():
+        print(f'{wall_name.capitalize()} wall blocked distance: {blocked_wall_distance} of {wall_distance}')
+    messages.append(total_wall_distance)
+    messages.append(total_blocked_wall_distance)
+
+    # Report equipment not placed
+    not_placed_counts = {}
+    if len(electrical_room.equipment_list) > 0:
+        for equipment in electrical_room.equipment_list:
+            equipment_found = False
+            for placed_equipment in electrical_room.placed_equipment:
+                if equipment.name == placed_equipment.name:
+                    print(f'Equipment {equipment.name} is in the placed equipment list')
+                    equipment_found = True
+                    break # If the equipment is in the placed equipment list, break
+            if not equipment_found:
+                print(f'Equipment {equipment.name} is not in the placed equipment list')
+                # If the equipment is not in the placed equipment list, add it to the not placed counts
+                class_name = equipment.__class__.__name__
+                if class_name in not_placed_counts:
+                    not_placed_counts[class_name] += 1
+                else:
+                    not_placed_counts[class_name] = 1
+
+    not_placed_messages = []
+    for key, value in not_placed_counts.items():
+        if value > 1:
+            not_placed_messages.append(f'{value} {key}s not placed')
+        else:
+            not_placed_messages.append(f'{value} {key} not placed')
+    if electrical_room.layout_failure_reason is not None:
+        not_placed_messages.append(electrical_room.layout_failure_reason)
+    if len(not_placed_messages) > 0:
+        messages.append('\n'.join(not_placed_messages))
     else:
-        not_placed_messages.append(f'{value} {key} not placed')
-if len(not_placed_messages) > 0:
-    messages.append('\n'.join(not_placed_messages))
-else:
-    messages.append('All equipment placed successfully')
+        messages.append('All equipment placed successfully')
 
-try:
-    equipment_geometry = th.list_to_tree(equipment_geometry)
-except:
-    pass
-try:
-    clearance_geometry = th.list_to_tree(clearance_geometry)
-except:
-    pass
-try:
-    room_geometry = th.list_to_tree(room_geometry)
-except:
-    pass
-print(f'output: {output}')
-try:
-    print(f'output to tree')
-    output = th.list_to_tree(output)
-except:
-    pass
\ No newline at end of file
+    try:
+        equipment_geometry = th.list_to_tree(equipment_geometry)
+    except:
+        pass
+    try:
+        clearance_geometry = th.list_to_tree(clearance_geometry)
+    except:
+        pass
+    try:
+        room_geometry = th.list_to_tree(room_geometry)
+    except:
+        pass
+    print(f'output: {output}')
+    try:
+        print(f'output to tree')
+        output = th.list_to_tree(output)
+    except:
+        pass
\ No newline at end of file
@@ -0,0 +1,46 @@
+# Find the smallest electrical room that fits a list of equipment
+# Usage:
+#   python solve_room_size.py --panelboards 12 --transformers 3
+#   python solve_room_size.py --panelboards 30 --transformers 6 --max-aspect-ratio 1.5 --door-walls south east
+#   python solve_room_size.py --panelboards 60 --transformers 10 --interior-rows
+# Prints the width, length and area of the smallest room found and the placements of its layout as JSON
+
+# Import necessary libraries
+import argparse
+import json
+
+import main
+
+def main_solver():
+    parser = argparse.ArgumentParser(description='Find the smallest electrical room that fits the equipment')
+    parser.add_argument('--panelboards', type=int, default=0, help='Number of default panelboards')
+    parser.add_argument('--transformers', type=int, default=0, help='Number of default transformers')
+    parser.add_argument('--door-walls', nargs='*', default=['south'], choices=['south', 'north', 'east', 'west'],
+                        help='Walls with a door in the middle')
+    parser.add_argument('--max-aspect-ratio', type=float, default=2.0, help='Largest ratio of the long to the short side')
+    parser.add_argument('--step', type=float, default=0.5, help='Room size increment in feet')
+    parser.add_argument('--max-size', type=float, default=200, help='Largest room side in feet')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the shuffled layouts')
+    parser.add_argument('--trials', type=int, default=1, help='Shuffled layouts tried for each room size')
+    parser.add_argument('--interior-rows', action='store_true', help='Also place equipment on rows inside the room')
+    arguments = parser.parse_args()
+
+    # The solver only lays out boxes, the geometry is not needed
+    main.set_geometry_backend(main.BoxBackend())
+
+    equipment_specs = main.create_room_spec(0, 0, arguments.panelboards, arguments.transformers, [])['equipment']
+    solver = main.RoomSizeSolver(equipment_specs, door_walls=arguments.door_walls, max_aspect_ratio=arguments.max_aspect_ratio,
+                                 step=arguments.step, seed=arguments.seed, trial_count=arguments.trials,
+                                 interior_rows=arguments.interior_rows)
+    solution = solver.solve(arguments.max_size)
+
+    if solution['success']:
+        print(f'Smallest room: {solution["width"]} x {solution["length"]} ({solution["area"]} sq ft)')
+    else:
+        print(f'No room up to {arguments.max_size} ft fits the equipment')
+    print(f'{solution["layout_count"]} layouts run, {solution["bound_rejected_count"]} sizes rejected by the lower bound')
+    if solution['success']:
+        print(json.dumps(solution['result']['placements'], indent=2))
+
+if __name__ == '__main__':
+    main_solver()